@@ -0,0 +1,114 @@
+"""Пакетное выполнение GET-запросов к API за один HTTP-запрос.
+
+Подзапросы разрешаются в представления api/urls.py и вызываются
+внутри процесса с теми же правами и аутентификацией. Пользователь
+определяется один раз для пакета и передается подзапросам через
+_force_auth_user, все подзапросы идут через одно соединение с базой
+и общие кеши процесса. Дорогие запросы (классы стоимости контроля
+допуска) в пакете не выполняются, их нужно отправлять отдельно.
+"""
+import logging
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.middleware import cost_class
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = '/api/'
+BATCH_PATH = '/api/batch/'
+# Заголовки, которые подзапрос не наследует от пакета.
+EXCLUDED_META = ('CONTENT_LENGTH', 'CONTENT_TYPE', 'QUERY_STRING')
+
+
+def error(status_code, message):
+    return {'status': status_code, 'body': {'errors': message}}
+
+
+def sub_request(request, path, query_string):
+    """GET-подзапрос с заголовками и пользователем пакета."""
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = path
+    sub.META = {
+        key: value
+        for key, value in request.META.items()
+        if key not in EXCLUDED_META
+    }
+    sub.META.update(
+        REQUEST_METHOD='GET', PATH_INFO=path, QUERY_STRING=query_string
+    )
+    sub.GET = QueryDict(query_string)
+    sub.COOKIES = request.COOKIES
+    if request.user.is_authenticated:
+        sub._force_auth_user = request.user
+        sub._force_auth_token = request.auth
+    return sub
+
+
+def run(request, url):
+    """Выполняем один подзапрос, возвращаем элемент ответа пакета."""
+    if not isinstance(url, str):
+        return error(status.HTTP_400_BAD_REQUEST, 'Ожидается строка адреса.')
+    parts = urlsplit(url)
+    if not parts.path.startswith(API_PREFIX) or parts.path == BATCH_PATH:
+        return error(status.HTTP_400_BAD_REQUEST, 'Адрес вне API.')
+    try:
+        match = resolve(parts.path)
+    except Resolver404:
+        return error(status.HTTP_404_NOT_FOUND, 'Адрес не найден.')
+    sub = sub_request(request._request, parts.path, parts.query)
+    sub.resolver_match = match
+    if cost_class(sub, match.url_name) is not None:
+        return error(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            'Этот запрос нужно выполнить отдельно.',
+        )
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception('Ошибка подзапроса пакета %s', url)
+        return error(
+            status.HTTP_500_INTERNAL_SERVER_ERROR, 'Ошибка сервера.'
+        )
+    if hasattr(response, 'data'):
+        body = response.data
+    elif response.streaming:
+        return error(
+            status.HTTP_400_BAD_REQUEST, 'Файлы в пакете не выдаются.'
+        )
+    else:
+        body = response.content.decode(response.charset)
+    return {'status': response.status_code, 'body': body}
+
+
+class BatchView(APIView):
+    """Пакет GET-запросов: {"requests": ["/api/tags/", ...]}.
+    Ответ: {"responses": [{"status": ..., "body": ...}, ...]} в том же
+    порядке."""
+
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        urls = request.data.get('requests')
+        if not isinstance(urls, list) or not urls:
+            return Response(
+                {'errors': 'Необходимо передать список requests.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(urls) > settings.BATCH_MAX_REQUESTS:
+            return Response(
+                {
+                    'errors': 'В пакете не больше '
+                    f'{settings.BATCH_MAX_REQUESTS} запросов.'
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response({'responses': [run(request, url) for url in urls]})
@@ -0,0 +1,87 @@
+"""Условные GET-запросы к рецептам (ETag, Last-Modified, 304).
+
+Валидаторы считаются до сериализации одним-двумя легкими запросами:
+для рецепта — его updated_at, для списка — число рецептов под
+фильтром и наибольший updated_at. updated_at обновляется сигналами
+при изменении состава, тегов, ингредиентов и автора рецепта.
+Для авторизованного пользователя в ETag входит версия его
+избранного, корзины и подписок (caching.versions), поскольку от них
+зависят флаги в ответе. Last-Modified отдается только для ответов без флагов
+пользователя: их изменение не отражается в дате рецепта.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+from caching import versions
+from recipes.trending import CHECKPOINT_KEY, get_checkpoint
+
+
+def user_state_fingerprint(user):
+    """Версия избранного, корзины и подписок пользователя: сигналы
+    меняют ее при любом добавлении или удалении. Читается из общего
+    кеша, чтобы изменение в другом воркере сразу меняло ETag."""
+    [version] = versions.get_versions(
+        versions.user_state(user.pk), fresh=True
+    )
+    return version
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(repr(parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def recipe_validators(queryset, pk, user, fields=None):
+    """ETag и дата изменения рецепта или (None, None), если его нет.
+    Выбранные поля ответа (fields) входят в ETag."""
+    updated_at = (
+        queryset.filter(pk=pk)
+        .order_by()
+        .values_list('updated_at', flat=True)
+        .first()
+    )
+    if updated_at is None:
+        return None, None
+    parts = [pk, updated_at]
+    if fields is not None:
+        parts.append(fields)
+    if user is None:
+        return make_etag(*parts), updated_at
+    return make_etag(*parts, user_state_fingerprint(user)), None
+
+
+def list_validators(queryset, user, ordering, fields=None):
+    """ETag страницы списка рецептов под фильтром (дата изменения
+    не отдается: удаление рецепта ее не сдвигает)."""
+    summary = queryset.order_by().aggregate(
+        count=Count('id'), last=Max('updated_at')
+    )
+    parts = [summary['count'], summary['last']]
+    if ordering == 'trending':
+        parts.append(get_checkpoint(CHECKPOINT_KEY, None))
+    if fields is not None:
+        parts.append(fields)
+    if user is not None:
+        parts.append(user_state_fingerprint(user))
+    return make_etag(*parts), None
+
+
+def not_modified(request, etag, last_modified=None):
+    """Ответ 304/412, если клиент прислал актуальные валидаторы."""
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=(
+            int(last_modified.timestamp()) if last_modified else None
+        ),
+    )
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
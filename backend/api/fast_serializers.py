@@ -0,0 +1,293 @@
+"""Быстрый путь чтения рецептов и подписок.
+
+Строит тот же JSON, что и RecipeSerializer/SubscriptionSerializer,
+из строк .values() и словарей связанных данных, без создания экземпляров
+моделей и дерева полей DRF на каждый объект. Теги, состав и автор
+рецепта читаются из его снимка (recipes.snapshots), запросы нужны
+только для флагов текущего пользователя. С выбранными полями
+(api.fieldsets) читаются только нужные колонки и выполняются только
+нужные запросы.
+"""
+from collections import defaultdict
+
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from api import fieldsets
+from recipes import snapshots
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription
+
+RECIPE_FIELDS = (
+    'id',
+    'author_id',
+    'name',
+    'image',
+    'text',
+    'cooking_time',
+    'snapshot',
+)
+RECIPE_SHORT_FIELDS = ('id', 'author_id', 'name', 'image', 'cooking_time')
+USER_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+SNAPSHOT_FIELDS = {'tags', 'author', 'ingredients'}
+USER_STATE_FIELDS = {'is_favorited', 'is_in_shopping_cart'}
+
+image_storage = Recipe._meta.get_field('image').storage
+
+
+def recipe_columns(fields=None):
+    """Колонки Recipe для выбранных полей ответа (None — все поля)."""
+    if fields is None:
+        return RECIPE_FIELDS
+    columns = ['id', 'author_id']
+    columns.extend(
+        column
+        for column in ('name', 'image', 'text', 'cooking_time')
+        if column in fields
+    )
+    if SNAPSHOT_FIELDS.intersection(fields):
+        columns.append('snapshot')
+    return tuple(columns)
+
+
+def user_columns(fields=None):
+    """Колонки User для выбранных полей ответа (None — все поля)."""
+    if fields is None:
+        return USER_FIELDS
+    return ('id',) + tuple(
+        column for column in USER_FIELDS if column in fields and column != 'id'
+    )
+
+
+def current_user(request):
+    """Авторизованный пользователь запроса или None."""
+    user = getattr(request, 'user', None)
+    if user is None or user.is_anonymous:
+        return None
+    return user
+
+
+def image_url(name, request=None):
+    """Ссылка на изображение так же, как ее отдает поле ImageField."""
+    if not name:
+        return None
+    url = image_storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def user_payload(row, is_subscribed=None):
+    """Словарь пользователя в формате CustomUserSerializer.
+    Без is_subscribed флаг подписки в ответ не попадает."""
+    payload = {
+        'email': row['email'],
+        'id': row['id'],
+        'username': row['username'],
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+    }
+    if is_subscribed is not None:
+        payload['is_subscribed'] = is_subscribed
+    return payload
+
+
+def subscribed_authors(user, author_ids):
+    """Множество авторов, на которых подписан пользователь."""
+    if user is None:
+        return set()
+    return set(
+        Subscription.objects.filter(
+            user=user, author_id__in=author_ids
+        ).values_list('author_id', flat=True)
+    )
+
+
+def user_recipe_ids(model, user, recipe_ids):
+    """Множество рецептов, которые пользователь добавил в model."""
+    if user is None:
+        return set()
+    return set(
+        model.objects.filter(user=user, recipe_id__in=recipe_ids).values_list(
+            'recipe_id', flat=True
+        )
+    )
+
+
+def recipe_snapshots(rows):
+    """Снимки тегов, состава и автора для строк рецептов в порядке
+    ключей API. Еще не собранные снимки строятся на лету."""
+    missing = [row for row in rows if not row['snapshot']]
+    built = snapshots.build(missing) if missing else {}
+    return {
+        row['id']: snapshots.restore_order(
+            built.get(row['id']) or row['snapshot']
+        )
+        for row in rows
+    }
+
+
+def serialize_recipes(rows, request, user_state=True, fields=None):
+    """Список рецептов в формате RecipeSerializer.
+    rows: строки Recipe.objects.values(*recipe_columns(fields)), теги,
+    состав и автор берутся из снимка рецепта. fields — выбранные поля
+    ответа (None — все).
+    С user_state=False флаги текущего пользователя не выводятся
+    и не запрашиваются: такой ответ одинаков для всех."""
+    rows = list(rows)
+    if not rows:
+        return []
+    fields = set(fields or fieldsets.RECIPE)
+    if not user_state:
+        fields -= USER_STATE_FIELDS
+    prepared = (
+        recipe_snapshots(rows) if SNAPSHOT_FIELDS & fields else {}
+    )
+    user = current_user(request)
+    recipe_ids = [row['id'] for row in rows]
+    subscribed = (
+        subscribed_authors(user, {row['author_id'] for row in rows})
+        if user_state and 'author' in fields
+        else set()
+    )
+    favorited = (
+        user_recipe_ids(Favorite, user, recipe_ids)
+        if 'is_favorited' in fields
+        else set()
+    )
+    in_cart = (
+        user_recipe_ids(ShoppingCart, user, recipe_ids)
+        if 'is_in_shopping_cart' in fields
+        else set()
+    )
+    data = []
+    for row in rows:
+        snapshot = prepared.get(row['id'])
+        payload = {}
+        if 'id' in fields:
+            payload['id'] = row['id']
+        if 'tags' in fields:
+            payload['tags'] = snapshot['tags']
+        if 'author' in fields:
+            payload['author'] = snapshot['author']
+            if user_state:
+                payload['author'] = {
+                    **snapshot['author'],
+                    'is_subscribed': row['author_id'] in subscribed,
+                }
+        if 'ingredients' in fields:
+            payload['ingredients'] = snapshot['ingredients']
+        if 'is_favorited' in fields:
+            payload['is_favorited'] = row['id'] in favorited
+        if 'is_in_shopping_cart' in fields:
+            payload['is_in_shopping_cart'] = row['id'] in in_cart
+        if 'name' in fields:
+            payload['name'] = row['name']
+        if 'image' in fields:
+            payload['image'] = image_url(row['image'])
+        if 'text' in fields:
+            payload['text'] = row['text']
+        if 'cooking_time' in fields:
+            payload['cooking_time'] = row['cooking_time']
+        data.append(payload)
+    return data
+
+
+def recipe_user_state(recipe_ids, user):
+    """Флаги пользователя для рецептов: по одному запросу к рецептам,
+    избранному, корзине и подпискам. Несуществующие id пропускаются."""
+    rows = list(
+        Recipe.objects.filter(id__in=recipe_ids)
+        .values('id', 'author_id')
+        .order_by('id')
+    )
+    ids = [row['id'] for row in rows]
+    favorited = user_recipe_ids(Favorite, user, ids)
+    in_cart = user_recipe_ids(ShoppingCart, user, ids)
+    subscribed = subscribed_authors(
+        user, {row['author_id'] for row in rows}
+    )
+    return [
+        {
+            'id': row['id'],
+            'is_favorited': row['id'] in favorited,
+            'is_in_shopping_cart': row['id'] in in_cart,
+            'author': {
+                'id': row['author_id'],
+                'is_subscribed': row['author_id'] in subscribed,
+            },
+        }
+        for row in rows
+    ]
+
+
+def short_recipe_payload(row, request=None):
+    """Словарь рецепта в формате RecipeListSerializer."""
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'image': image_url(row['image'], request),
+        'cooking_time': row['cooking_time'],
+    }
+
+
+def author_recipes(author_ids, limit=None):
+    """Рецепты авторов, не больше limit первых рецептов каждого автора
+    (лимит применяется в базе)."""
+    queryset = Recipe.objects.filter(author_id__in=author_ids)
+    if limit is None:
+        return queryset
+    ranked = queryset.annotate(
+        author_rank=Window(
+            RowNumber(),
+            partition_by=F('author_id'),
+            order_by=[F('pub_date').desc(), F('name').asc()],
+        )
+    ).values('id', 'author_rank')
+    # Django 3.2 не фильтрует по оконным функциям: фильтр во внешнем
+    # запросе над ранжированным подзапросом.
+    sql, params = ranked.query.sql_with_params()
+    return queryset.filter(
+        id__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE author_rank <= %s',
+            (*params, limit),
+        )
+    )
+
+
+def serialize_subscriptions(
+    rows, request, recipes_limit=None, fields=None
+):
+    """Список авторов в формате SubscriptionSerializer.
+    rows: строки пользователей с полями user_columns(fields)
+    и recipes_count, если оно выбрано. fields — выбранные поля ответа
+    (None — все)."""
+    rows = list(rows)
+    if not rows:
+        return []
+    fields = fields or fieldsets.SUBSCRIPTION
+    author_ids = [row['id'] for row in rows]
+    subscribed = (
+        subscribed_authors(current_user(request), author_ids)
+        if 'is_subscribed' in fields
+        else set()
+    )
+    recipes = defaultdict(list)
+    if 'recipes' in fields:
+        for row in author_recipes(author_ids, recipes_limit).values(
+            *RECIPE_SHORT_FIELDS
+        ):
+            recipes[row['author_id']].append(short_recipe_payload(row))
+    data = []
+    for row in rows:
+        payload = {}
+        for field in fields:
+            if field == 'is_subscribed':
+                payload[field] = row['id'] in subscribed
+            elif field == 'recipes':
+                payload[field] = recipes[row['id']]
+            else:
+                payload[field] = row[field]
+        data.append(payload)
+    return data
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image, UnidentifiedImageError
+from rest_framework.fields import ImageField
+from rest_framework.serializers import ValidationError
+
+
+class RecipeImageField(Base64ImageField):
+    """Изображение рецепта: строка Base64 (как отправляет фронтенд)
+    или файл из multipart/form-data.
+
+    Размер и формат проверяются до полного декодирования: для Base64
+    по длине строки, для файла по размеру загрузки и заголовку
+    изображения. Загруженный файл Django уже записал во временный файл,
+    поэтому Pillow читает его с диска, а не из памяти."""
+
+    def to_internal_value(self, data):
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
+        if isinstance(data, str):
+            if len(data) * 3 // 4 > max_size:
+                raise ValidationError(self.size_error(max_size))
+            return super().to_internal_value(data)
+        if not isinstance(data, UploadedFile):
+            return super().to_internal_value(data)
+        if data.size > max_size:
+            raise ValidationError(self.size_error(max_size))
+        try:
+            image_format = Image.open(data).format
+        except (UnidentifiedImageError, OSError):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        finally:
+            data.seek(0)
+        if not image_format or image_format.lower() not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        return ImageField.to_internal_value(self, data)
+
+    @staticmethod
+    def size_error(max_size):
+        return (
+            'Размер изображения не должен превышать '
+            f'{max_size // (1024 * 1024)} МБ.'
+        )
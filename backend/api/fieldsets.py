@@ -0,0 +1,74 @@
+"""Выборочные поля ответа: параметры fields и omit.
+
+fields=id,name,image оставляет в ответе только перечисленные поля,
+omit=text,ingredients убирает перечисленные. Выбранные поля сужают
+и запрос к базе: не читаются ненужные колонки, не выполняются
+запросы флагов пользователя и связанных данных, которые не попадут
+в ответ.
+"""
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+RECIPE = (
+    'id',
+    'tags',
+    'author',
+    'ingredients',
+    'is_favorited',
+    'is_in_shopping_cart',
+    'name',
+    'image',
+    'text',
+    'cooking_time',
+)
+USER = ('email', 'id', 'username', 'first_name', 'last_name', 'is_subscribed')
+SUBSCRIPTION = USER + ('recipes', 'recipes_count')
+
+
+def split(query_params, name):
+    return {
+        field
+        for values in query_params.getlist(name)
+        for field in values.split(',')
+        if field
+    }
+
+
+def requested_fields(query_params, available):
+    """Выбранные поля в порядке available или None, если параметры
+    не переданы (ответ целиком)."""
+    fields = split(query_params, 'fields')
+    omit = split(query_params, 'omit')
+    if not fields and not omit:
+        return None
+    unknown = (fields | omit) - set(available)
+    if unknown:
+        raise ValueError(f'Неизвестные поля: {", ".join(sorted(unknown))}.')
+    selected = tuple(
+        field
+        for field in available
+        if (not fields or field in fields) and field not in omit
+    )
+    if not selected:
+        raise ValueError('Не выбрано ни одного поля.')
+    return selected
+
+
+class SparseFieldsMixin:
+    """Разбирает fields/omit для действий из sparse_fields
+    ({действие: допустимые поля}) в self.selected_fields."""
+
+    sparse_fields = {}
+    selected_fields = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        available = self.sparse_fields.get(self.action)
+        if available is None or request.method not in SAFE_METHODS:
+            return
+        try:
+            self.selected_fields = requested_fields(
+                request.query_params, available
+            )
+        except ValueError as error:
+            raise ValidationError({'errors': str(error)})
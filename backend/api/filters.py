@@ -1,16 +1,28 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Exists, F, OuterRef
 from django_filters.rest_framework import (
     BooleanFilter,
     CharFilter,
+    ChoiceFilter,
     FilterSet,
-    ModelMultipleChoiceFilter,
+    MultipleChoiceFilter,
 )
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from recipes.tag_slugs import tag_slugs
 
 User = get_user_model()
 
 
+# Фильтры, результат которых зависит от текущего пользователя.
+USER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def tag_slug_choices():
+    """Допустимые слаги тегов из кеша с версией пространства tags."""
+    return tag_slugs.choices()
+
+
 class IngredientFilter(FilterSet):
     """Фильтр для поиска по списку ингредиентов
     (поиск ведется по вхождению в начало названия)."""
@@ -23,16 +35,22 @@ class IngredientFilter(FilterSet):
 
 
 class RecipeFilter(FilterSet):
-    """Фильтр для рецептов."""
+    """Фильтр для рецептов.
+
+    Все условия по связанным таблицам строятся как полусоединения
+    (EXISTS), поэтому строки рецептов не размножаются и DISTINCT
+    не нужен."""
 
-    tags = ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = MultipleChoiceFilter(
+        choices=tag_slug_choices,
+        method='filter_tags',
     )
 
     is_favorited = BooleanFilter(method='filter_favorite_or_cart')
     is_in_shopping_cart = BooleanFilter(method='filter_favorite_or_cart')
+    ordering = ChoiceFilter(
+        choices=(('trending', 'trending'),), method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
@@ -41,10 +59,28 @@ class RecipeFilter(FilterSet):
             'author',
         )
 
+    def filter_tags(self, queryset, name, value):
+        """Рецепты, у которых есть хотя бы один из переданных тегов."""
+        if not value:
+            return queryset
+        recipe_tags = Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'), tag_id__in=tag_slugs.ids(value)
+        )
+        return queryset.filter(Exists(recipe_tags))
+
     def filter_favorite_or_cart(self, queryset, name, value):
         user = self.request.user
         if not value or user.is_anonymous:
             return queryset
-        field_name = 'favorite' if name == 'is_favorited' else 'shoppingcart'
-        filter_parameters = {f'{field_name}__user': user}
-        return queryset.filter(**filter_parameters)
+        model = Favorite if name == 'is_favorited' else ShoppingCart
+        return queryset.filter(
+            Exists(model.objects.filter(recipe_id=OuterRef('pk'), user=user))
+        )
+
+    def filter_ordering(self, queryset, name, value):
+        """Сортировка по популярности (см. recipes.trending)."""
+        if value == 'trending':
+            return queryset.order_by(
+                F('trend__score').desc(nulls_last=True), '-pub_date'
+            )
+        return queryset
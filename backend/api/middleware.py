@@ -0,0 +1,177 @@
+"""Контроль допуска запросов к дорогим эндпоинтам.
+
+Каждому дорогому эндпоинту назначается класс стоимости. Для класса
+задано число одновременно выполняемых запросов на весь сервер: слоты
+реализованы файловыми блокировками (flock), поэтому лимит общий для
+всех воркеров gunicorn и освобождается даже при падении воркера.
+Дополнительно у каждого пользователя есть «ведро токенов» на класс.
+Запросы сверх лимита сразу получают 429/503 с заголовком Retry-After,
+а дешевые запросы на чтение проходят без ограничений.
+"""
+import fcntl
+import hashlib
+import math
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+
+class Slot:
+    """Занятый слот класса стоимости (открытый и заблокированный файл)."""
+
+    def __init__(self, file):
+        self.file = file
+
+    def release(self):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def acquire_slot(cost_class, concurrency):
+    """Пытаемся занять свободный слот класса, не дожидаясь освобождения."""
+    lock_dir = settings.ADMISSION_CONTROL['LOCK_DIR']
+    os.makedirs(lock_dir, exist_ok=True)
+    for number in range(concurrency):
+        path = os.path.join(lock_dir, f'{cost_class}.{number}.lock')
+        file = open(path, 'a')
+        try:
+            fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            file.close()
+            continue
+        return Slot(file)
+    return None
+
+
+@contextmanager
+def bucket_lock(key):
+    """Блокировка счетчиков ведра на время add/incr/decr. Сетевые кеши
+    выполняют их атомарно и сами, а файловый кеш реализует incr как
+    чтение и запись, поэтому для него нужна блокировка (flock в
+    каталоге слотов, общая для воркеров сервера)."""
+    lock_dir = settings.ADMISSION_CONTROL['LOCK_DIR']
+    os.makedirs(lock_dir, exist_ok=True)
+    stripe = hashlib.sha1(key.encode()).hexdigest()[:2]
+    with open(os.path.join(lock_dir, f'bucket.{stripe}.lock'), 'a') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def take_token(key, capacity, refill_rate):
+    """Берем токен из ведра клиента. Возвращаем 0, если токен выдан,
+    иначе число секунд до появления следующего токена.
+
+    Ведро — скользящее окно длиной capacity / refill_rate секунд:
+    счетчик текущего окна плюс доля счетчика предыдущего, еще не
+    вышедшая из окна. Счетчики меняются только через add, incr и decr
+    общего кеша (минуя память процесса) под bucket_lock, поэтому
+    одновременные запросы разных воркеров не перезаписывают друг
+    друга."""
+    cache = caches[settings.CACHING['SHARED']]
+    window = capacity / refill_rate
+    number, elapsed = divmod(time.time(), window)
+    current = f'{key}:{int(number)}'
+    timeout = math.ceil(window * 2)
+    previous = cache.get(f'{key}:{int(number) - 1}', 0)
+    weight = 1 - elapsed / window
+    with bucket_lock(key):
+        if cache.add(current, 1, timeout=timeout):
+            count = 1
+        else:
+            try:
+                count = cache.incr(current)
+            except ValueError:
+                # Счетчик вытеснен между add и incr.
+                cache.add(current, 1, timeout=timeout)
+                count = 1
+        excess = previous * weight + count - capacity
+        if excess <= 0:
+            return 0
+        # Отклоненный запрос токен не расходует.
+        try:
+            cache.decr(current)
+        except ValueError:
+            pass
+    if previous and excess <= previous * weight:
+        wait = excess * window / previous
+    else:
+        wait = window - elapsed
+    return max(1, math.ceil(wait))
+
+
+def client_key(request):
+    """Идентификатор клиента: хеш токена авторизации или IP-адрес."""
+    authorization = request.META.get('HTTP_AUTHORIZATION')
+    if authorization:
+        return hashlib.sha1(authorization.encode()).hexdigest()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def cost_class(request, url_name):
+    """Определяем класс стоимости запроса по имени маршрута и методу."""
+    config = settings.ADMISSION_CONTROL
+    for name, methods, class_name in config['ROUTES']:
+        if name == url_name and request.method in methods:
+            return class_name
+    if url_name in config['DEEP_PAGE_ROUTES']:
+        try:
+            page = int(request.GET.get('page', 1))
+        except ValueError:
+            return None
+        if page > config['DEEP_PAGE']:
+            return 'deep_page'
+    return None
+
+
+def rejection(message, status, retry_after):
+    response = JsonResponse({'errors': message}, status=status)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+class AdmissionControlMiddleware:
+    """Ограничивает одновременные и частые запросы к дорогим эндпоинтам."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        slot = getattr(request, '_admission_slot', None)
+        if slot is not None:
+            slot.release()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        config = settings.ADMISSION_CONTROL
+        if not config['ENABLED']:
+            return None
+        class_name = cost_class(request, request.resolver_match.url_name)
+        if class_name is None:
+            return None
+        limits = config['CLASSES'][class_name]
+        retry_after = take_token(
+            f'admission:{class_name}:{client_key(request)}',
+            limits['burst'],
+            limits['rate'],
+        )
+        if retry_after:
+            return rejection(
+                'Слишком много запросов, повторите позже.', 429, retry_after
+            )
+        slot = acquire_slot(class_name, limits['concurrency'])
+        if slot is None:
+            return rejection(
+                'Сервер перегружен, повторите позже.',
+                503,
+                config['RETRY_AFTER'],
+            )
+        request._admission_slot = slot
+        return None
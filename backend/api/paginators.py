@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки для больших таблиц.
+
+    Для нефильтрованного списка в PostgreSQL количество строк берется
+    из статистики планировщика (pg_class.reltuples) вместо COUNT(*).
+    Для отфильтрованного списка строки считаются, но не дальше
+    ADMIN_COUNT_LIMIT: страниц дальше этой границы в админке не видно."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        query = queryset.query
+        if not query.where:
+            estimate = self.estimated_count(queryset)
+            if estimate is not None and estimate > settings.ADMIN_COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:settings.ADMIN_COUNT_LIMIT].count()
+
+    @staticmethod
+    def estimated_count(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] > 0 else None
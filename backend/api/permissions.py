@@ -6,7 +6,7 @@ class IsAuthorOrReadOnly(BasePermission):
     для всех остальных доступно лишь чтение."""
 
     def has_object_permission(self, request, view, obj):
-        return obj.author == request.user or request.method in SAFE_METHODS
+        return request.method in SAFE_METHODS or obj.author == request.user
 
 
 class IsAdminOrReadOnly(BasePermission):
@@ -0,0 +1,46 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson с тем же выводом, что и JSONRenderer
+    (компактный, без экранирования не-ASCII символов).
+
+    Для форматированного вывода, типов, которые orjson не знает,
+    и окружений без orjson используется стандартный рендерер DRF."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем U+2028 и U+2029.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+
+
+class PDFRenderer(BaseRenderer):
+    """Формат pdf (?format=pdf или Accept: application/pdf) для действий,
+    которые сами отдают файл. Остальные ответы таких действий (ошибки,
+    202) выводятся в JSON."""
+
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = FastJSONRenderer.media_type
+        return FastJSONRenderer().render(data)
@@ -0,0 +1,50 @@
+"""Общий кеш ответов ленты рецептов для анонимных пользователей.
+
+Для анонимов флаги is_favorited/is_in_shopping_cart/is_subscribed
+всегда ложны, поэтому ответ зависит только от параметров запроса.
+Ключ строится по нормализованным параметрам и версии пространства
+recipes (caching.versions), которую сигналы меняют при изменении
+рецептов, тегов, ингредиентов и авторов; старые ключи просто перестают
+читаться. Защита от одновременного пересчета — в caching.helpers.
+"""
+import hashlib
+
+from django.conf import settings
+
+from caching import versions
+from caching.helpers import get_or_compute as cached_compute
+
+
+def normalized_params(query_params):
+    """Параметры запроса в каноническом виде: ключи и значения
+    отсортированы, пустые значения и page=1 отброшены."""
+    params = []
+    for key in sorted(query_params):
+        values = sorted(value for value in query_params.getlist(key) if value)
+        if key == 'page' and values == ['1']:
+            continue
+        if values:
+            params.append(f'{key}={",".join(values)}')
+    return '&'.join(params)
+
+
+def cache_key(request, action):
+    """Ключ ответа: адрес без параметров (в ответах пагинатора есть
+    абсолютные ссылки) и нормализованные параметры запроса."""
+    raw = '|'.join(
+        (
+            request.build_absolute_uri(request.path),
+            normalized_params(request.query_params),
+        )
+    )
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return versions.versioned_key(
+        f'recipes:{action}:{digest}', versions.RECIPES
+    )
+
+
+def get_or_compute(key, compute):
+    """Берем ответ из кеша или вычисляем его."""
+    return cached_compute(
+        key, compute, settings.RESPONSE_CACHE['TIMEOUT']
+    )
@@ -1,4 +1,7 @@
-from drf_extra_fields.fields import Base64ImageField
+import json
+
+from django.db import transaction
+from django.http import QueryDict
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework.serializers import (
     ModelSerializer,
@@ -8,7 +11,11 @@ from rest_framework.serializers import (
     ValidationError,
 )
 
+from api.fields import RecipeImageField
+from jobs.queue import enqueue
+from recipes.cart import recipe_amounts
 from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from recipes.signals import recipe_composition_changed
 from users.models import User
 
 
@@ -43,6 +50,15 @@ class CustomUserSerializer(UserSerializer):
             'is_subscribed',
         )
 
+    def __init__(self, *args, **kwargs):
+        """Оставляем только поля, выбранные параметрами fields/omit
+        (api.fieldsets): невыбранный is_subscribed не запрашивается."""
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def get_is_subscribed(self, obj):
         """Определяем подписан ли пользователь на просматриваемого
         пользователя (значение параметра is_subscribed: true или false)."""
@@ -190,9 +206,13 @@ class RecipeSerializer(ModelSerializer):
 
 
 class RecipeCreateSerializer(ModelSerializer):
-    """Сериализатор создания и изменения рецепта."""
+    """Сериализатор создания и изменения рецепта.
+
+    Принимает JSON с изображением в Base64 или multipart/form-data:
+    теги передаются повторяющимся полем `tags`, ингредиенты строкой
+    JSON в поле `ingredients`, изображение файлом в поле `image`."""
 
-    image = Base64ImageField()
+    image = RecipeImageField()
     ingredients = RecipeIngredientCreateSerializer(
         source='recipeingredients', many=True
     )
@@ -209,7 +229,32 @@ class RecipeCreateSerializer(ModelSerializer):
             'cooking_time',
         )
 
+    def __init__(self, *args, **kwargs):
+        if isinstance(kwargs.get('data'), QueryDict):
+            kwargs['data'] = self.form_data_to_dict(kwargs['data'])
+        super().__init__(*args, **kwargs)
+
+    @staticmethod
+    def form_data_to_dict(data):
+        """Доп.функция: приводим multipart-данные к виду JSON-запроса."""
+        result = data.dict()
+        if 'tags' in data:
+            result['tags'] = data.getlist('tags')
+        if 'ingredients' in data:
+            try:
+                result['ingredients'] = json.loads(data['ingredients'])
+            except ValueError:
+                pass
+        return result
+
     def to_representation(self, instance):
+        """Ответ в формате чтения; состав и теги читаются одним запросом
+        каждый, а не по запросу на ингредиент."""
+        instance = (
+            Recipe.objects.select_related('author')
+            .prefetch_related('tags', 'recipeingredients__ingredient')
+            .get(pk=instance.pk)
+        )
         serializer = RecipeSerializer(instance, context=self.context)
         return serializer.data
 
@@ -243,6 +288,7 @@ class RecipeCreateSerializer(ModelSerializer):
             ingredients_set.add(ingredient_id)
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         """Создание нового рецепта с сохранением
         связанных тегов и ингредиентов."""
@@ -252,20 +298,44 @@ class RecipeCreateSerializer(ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_recipe_ingredient(recipe, ingredients)
+        recipe_composition_changed.send(
+            sender=Recipe, recipe=recipe, created=True
+        )
+        self.enqueue_image_renditions(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Изменение рецепта с обновлением связанных тегов и
         ингредиентов."""
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('recipeingredients')
+        old_amounts = recipe_amounts(instance.pk)
         instance.ingredients.clear()
         instance.tags.clear()
         super().update(instance, validated_data)
         instance.tags.set(tags)
         self.create_recipe_ingredient(instance, ingredients)
+        recipe_composition_changed.send(
+            sender=Recipe,
+            recipe=instance,
+            created=False,
+            old_amounts=old_amounts,
+        )
+        self.enqueue_image_renditions(instance)
         return instance
 
+    def enqueue_image_renditions(self, recipe):
+        """Доп.функция: уменьшенные копии изображения готовит фоновая
+        задача после фиксации транзакции."""
+        transaction.on_commit(
+            lambda: enqueue(
+                'recipes.image_renditions',
+                {'recipe_id': recipe.pk},
+                unique_key=f'renditions:{recipe.image.name}',
+            )
+        )
+
     def create_recipe_ingredient(self, recipe, ingredients):
         """Доп.функция: создаем связку рецепт<->ингредиент."""
         recipe_ingredients = []
@@ -1,6 +1,7 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api.batch import BatchView
 from api.views import (
     CustomUserViewSet,
     IngredientViewSet,
@@ -18,4 +19,5 @@ router_v1.register(r'recipes', RecipeViewSet, basename='recipes')
 urlpatterns = [
     path('', include(router_v1.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('batch/', BatchView.as_view(), name='batch'),
 ]
@@ -1,8 +1,14 @@
 from collections import defaultdict
 
 from djoser.views import UserViewSet
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import transaction
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db.models import Count
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse
+from django.shortcuts import get_object_or_404, redirect
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.viewsets import (
@@ -14,8 +20,19 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated, SAFE_METHODS
 from rest_framework.response import Response
 
-from api.filters import IngredientFilter, RecipeFilter
+from api.fast_serializers import (
+    recipe_columns,
+    recipe_user_state,
+    serialize_recipes,
+    serialize_subscriptions,
+    user_columns,
+)
+from api import conditional, fieldsets, response_cache
+from api.fieldsets import SparseFieldsMixin
+from api.filters import USER_FILTERS, IngredientFilter, RecipeFilter
+from api.middleware import rejection
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from api.renderers import FastJSONRenderer, PDFRenderer
 from api.serializers import (
     IngredientSerializer,
     RecipeCreateSerializer,
@@ -24,14 +41,19 @@ from api.serializers import (
     SubscriptionSerializer,
     TagSerializer,
 )
+from jobs.queue import enqueue
+from recipes import cart, deletion, pdf
 from recipes.models import (
     Favorite,
     Ingredient,
     Recipe,
-    RecipeIngredients,
     ShoppingCart,
     Tag,
 )
+from recipes.pantry import pantry_index
+from recipes.tasks import rendition_name
+from sync import changes as change_log
+from sync.models import Change
 from users.models import Subscription, User
 
 
@@ -41,30 +63,59 @@ class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(SparseFieldsMixin, UserViewSet):
     """Кастомный Viewset модели пользователя."""
 
     queryset = User.objects.all()
     permission_classes = [AllowAny]
     pagination_class = CustomPageNumberPagination
+    # Бюджет SQL-запросов по действиям (profiling.detector).
+    query_budgets = {'subscriptions': 5}
+    sparse_fields = {
+        'list': fieldsets.USER,
+        'retrieve': fieldsets.USER,
+        'me': fieldsets.USER,
+        'subscriptions': fieldsets.SUBSCRIPTION,
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.selected_fields is not None:
+            queryset = queryset.only(*user_columns(self.selected_fields))
+        return queryset
+
+    def get_serializer_context(self):
+        return {
+            **super().get_serializer_context(),
+            'fields': self.selected_fields,
+        }
+
+    def perform_destroy(self, instance):
+        """Пользователь деактивируется сразу, его данные удаляет
+        фоновая задача (recipes.deletion)."""
+        deletion.schedule_user_deletion(instance.pk)
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         """Получаем список пользователей,
         на которого подписан текущий пользователь"""
+        fields = self.selected_fields or fieldsets.SUBSCRIPTION
         queryset = User.objects.filter(following__user=request.user)
+        columns = user_columns(self.selected_fields)
+        if 'recipes_count' in fields:
+            queryset = queryset.annotate(recipes_count=Count('recipes'))
+            columns += ('recipes_count',)
+        queryset = queryset.values(*columns).order_by('id')
+        recipes_limit = request.GET.get('recipes_limit')
         paginator = CustomPageNumberPagination()
         paginated_queryset = paginator.paginate_queryset(queryset, request)
-        serializer = SubscriptionSerializer(
+        data = serialize_subscriptions(
             paginated_queryset,
-            many=True,
-            context={
-                'request': request,
-                'format': self.format_kwarg,
-                'view': self,
-            },
+            request,
+            int(recipes_limit) if recipes_limit else None,
+            self.selected_fields,
         )
-        return paginator.get_paginated_response(serializer.data)
+        return paginator.get_paginated_response(data)
 
     @action(
         methods=['post', 'delete'],
@@ -130,22 +181,136 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(SparseFieldsMixin, ModelViewSet):
     """Viewset модели рецепта."""
 
-    queryset = Recipe.objects.prefetch_related(
+    # Рецепты пользователя, ожидающего удаления, уже не показываются.
+    queryset = Recipe.objects.filter(author__is_active=True).prefetch_related(
         'author', 'tags', 'ingredients'
-    ).all()
+    )
     permission_classes = [IsAuthorOrReadOnly]
     pagination_class = CustomPageNumberPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    # Бюджет SQL-запросов по действиям (profiling.detector).
+    query_budgets = {'list': 10, 'retrieve': 7, 'state': 5}
+    sparse_fields = {'list': fieldsets.RECIPE, 'retrieve': fieldsets.RECIPE}
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeSerializer
         return RecipeCreateSerializer
 
+    def initialize_request(self, request, *args, **kwargs):
+        """Изображения из multipart-запросов сразу пишутся во временный
+        файл, а не собираются в памяти."""
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def user_state_requested(self, request):
+        """Флаги пользователя в ответе можно отключить параметром
+        user_state=0 и получить их отдельно через /recipes/state/."""
+        return request.query_params.get('user_state') != '0'
+
+    def user_dependent(self, request):
+        """Ответ авторизованному пользователю зависит от него, если
+        в ответе есть его флаги или список отфильтрован по его
+        избранному или корзине."""
+        return request.user.is_authenticated and (
+            self.user_state_requested(request)
+            or any(request.query_params.get(name) for name in USER_FILTERS)
+        )
+
+    def conditional_response(self, request, validators, compute):
+        """Ответ с ETag, 304 при актуальной версии у клиента.
+        Анонимам (их флаги всегда ложны) и всем, чей ответ не зависит
+        от пользователя, ответ отдается из общего кеша вместе
+        с валидаторами. validators(user) -> (etag, last_modified)."""
+        if self.user_dependent(request):
+            etag, last_modified = validators(request.user)
+            data = None
+        else:
+            key = response_cache.cache_key(request, self.action)
+            etag, last_modified, data = response_cache.get_or_compute(
+                key, lambda: (*validators(None), compute())
+            )
+        if etag is None:
+            return Response(compute() if data is None else data)
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is None:
+            response = Response(compute() if data is None else data)
+        return conditional.set_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        """Список рецептов через быстрый путь чтения
+        (тот же JSON, что и у RecipeSerializer)."""
+        queryset = self.filter_queryset(self.get_queryset())
+
+        def validators(user):
+            return conditional.list_validators(
+                queryset,
+                user,
+                request.query_params.get('ordering'),
+                self.selected_fields,
+            )
+
+        def compute():
+            rows = self.paginate_queryset(
+                queryset.values(*recipe_columns(self.selected_fields))
+            )
+            data = serialize_recipes(
+                rows,
+                request,
+                self.user_state_requested(request),
+                self.selected_fields,
+            )
+            return self.get_paginated_response(data).data
+
+        return self.conditional_response(request, validators, compute)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт через быстрый путь чтения."""
+
+        def validators(user):
+            return conditional.recipe_validators(
+                self.get_queryset(), kwargs['pk'], user, self.selected_fields
+            )
+
+        def compute():
+            row = get_object_or_404(
+                self.get_queryset().values(
+                    *recipe_columns(self.selected_fields)
+                ),
+                pk=kwargs['pk'],
+            )
+            self.check_object_permissions(
+                request, Recipe(id=row['id'], author_id=row['author_id'])
+            )
+            return serialize_recipes(
+                [row],
+                request,
+                self.user_state_requested(request),
+                self.selected_fields,
+            )[0]
+
+        return self.conditional_response(request, validators, compute)
+
+    def destroy(self, request, *args, **kwargs):
+        """Рецепт с большим числом добавлений в избранное и корзины
+        удаляет фоновая задача: пока она не завершилась, отвечаем 202."""
+        recipe = self.get_object()
+        if (
+            deletion.recipe_fanout(recipe.pk)
+            > settings.DELETION['ASYNC_THRESHOLD']
+        ):
+            job = deletion.schedule_recipe_deletion(recipe.pk)
+            return Response(
+                {'job': job.pk, 'status': job.status},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        deletion.delete_recipe(recipe.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     def handle_action(self, request, pk, model_class):
         if request.method == "POST":
             data, status = self.create_recipe_user(request, pk, model_class)
@@ -165,43 +330,246 @@ class RecipeViewSet(ModelViewSet):
         data, status = self.handle_action(request, pk, ShoppingCart)
         return Response(data, status=status)
 
+    @action(methods=['get'], detail=True)
+    def similar(self, request, pk):
+        """Похожие рецепты из предрассчитанной таблицы."""
+        get_object_or_404(Recipe, pk=pk, author__is_active=True)
+        recipes = Recipe.objects.filter(
+            similar_to__recipe_id=pk, author__is_active=True
+        ).order_by(
+            '-similar_to__score'
+        )
+        serializer = RecipeListSerializer(
+            recipes, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
+    @action(methods=['get'], detail=True)
+    def image(self, request, pk):
+        """Перенаправляем на уменьшенную копию изображения рецепта
+        (параметр size: размер из RECIPE_IMAGE_RENDITIONS), а пока
+        фоновая задача ее не подготовила — на исходное изображение."""
+        sizes = settings.RECIPE_IMAGE_RENDITIONS
+        size = request.query_params.get('size')
+        if size not in sizes:
+            return Response(
+                {'errors': f'Допустимые размеры: {", ".join(sizes)}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        recipe = get_object_or_404(Recipe.objects.only('image'), pk=pk)
+        name = rendition_name(recipe.image.name, size)
+        if default_storage.exists(name):
+            url = default_storage.url(name)
+        else:
+            url = recipe.image.url
+        return redirect(request.build_absolute_uri(url))
+
+    @action(
+        methods=['get'], detail=False, permission_classes=[IsAuthenticated]
+    )
+    def state(self, request):
+        """Флаги текущего пользователя для списка рецептов:
+        is_favorited, is_in_shopping_cart и подписка на автора.
+        Параметр ids: id рецептов (можно несколько или через запятую)."""
+        try:
+            recipe_ids = {
+                int(value)
+                for values in request.query_params.getlist('ids')
+                for value in values.split(',')
+                if value
+            }
+        except ValueError:
+            return Response(
+                {'errors': 'Параметры должны быть целыми числами.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not recipe_ids:
+            return Response(
+                {'errors': 'Необходимо указать хотя бы один рецепт.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(recipe_ids) > settings.RECIPE_STATE_MAX_IDS:
+            return Response(
+                {
+                    'errors': 'Можно запросить не больше '
+                    f'{settings.RECIPE_STATE_MAX_IDS} рецептов.'
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(recipe_user_state(recipe_ids, request.user))
+
     @action(
         methods=['get'], detail=False, permission_classes=[IsAuthenticated]
     )
+    def changes(self, request):
+        """Изменения после курсора: созданные, измененные и удаленные
+        рецепты, избранное, корзина и подписки пользователя.
+        Без курсора возвращает только текущий курсор."""
+        cursor = request.query_params.get('cursor')
+        if not cursor:
+            position = change_log.current_position()
+            return Response({'cursor': change_log.encode_cursor(position)})
+        try:
+            position = change_log.decode_cursor(cursor)
+            rows, position, has_more = change_log.changes_since(
+                request.user, position, settings.SYNC['LIMIT']
+            )
+        except ValueError as error:
+            return Response(
+                {'errors': str(error)}, status=status.HTTP_400_BAD_REQUEST
+            )
+        except change_log.CursorExpired:
+            return Response(
+                {'errors': 'Курсор устарел, нужна полная синхронизация.'},
+                status=status.HTTP_410_GONE,
+            )
+        grouped = defaultdict(lambda: defaultdict(list))
+        for (kind, object_id), change in change_log.collapse(rows).items():
+            grouped[kind][change].append(object_id)
+        recipes = grouped[Change.Kind.RECIPE]
+        created = set(recipes[Change.Action.CREATE])
+        payloads = serialize_recipes(
+            Recipe.objects.filter(
+                id__in=created | set(recipes[Change.Action.UPDATE])
+            )
+            .values(*recipe_columns())
+            .order_by('id'),
+            request,
+        )
+        data = {
+            'cursor': change_log.encode_cursor(position),
+            'has_more': has_more,
+            'recipes': {
+                'created': [r for r in payloads if r['id'] in created],
+                'updated': [r for r in payloads if r['id'] not in created],
+                'deleted': sorted(recipes[Change.Action.DELETE]),
+            },
+        }
+        for key, kind in (
+            ('favorites', Change.Kind.FAVORITE),
+            ('shopping_cart', Change.Kind.SHOPPING_CART),
+            ('subscriptions', Change.Kind.SUBSCRIPTION),
+        ):
+            data[key] = {
+                'added': sorted(grouped[kind][Change.Action.CREATE]),
+                'removed': sorted(grouped[kind][Change.Action.DELETE]),
+            }
+        return Response(data)
+
+    @action(methods=['get'], detail=False)
+    def pantry(self, request):
+        """Рецепты, которые можно приготовить из имеющихся продуктов.
+        Параметры: ingredients (id, можно несколько) и max_missing."""
+        try:
+            ingredient_ids = [
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',')
+                if value
+            ]
+            max_missing = int(request.query_params.get('max_missing', 0))
+        except ValueError:
+            return Response(
+                {'errors': 'Параметры должны быть целыми числами.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not ingredient_ids:
+            return Response(
+                {'errors': 'Необходимо указать хотя бы один ингредиент.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if max_missing < 0:
+            return Response(
+                {'errors': 'max_missing не может быть отрицательным.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        recipe_ids = pantry_index.search(ingredient_ids, max_missing)
+        paginator = CustomPageNumberPagination()
+        page_ids = paginator.paginate_queryset(recipe_ids, request)
+        recipes = Recipe.objects.in_bulk(page_ids)
+        serializer = RecipeListSerializer(
+            [recipes[pk] for pk in page_ids if pk in recipes],
+            many=True,
+            context={'request': request},
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[FastJSONRenderer, PDFRenderer],
+    )
     def download_shopping_cart(self, request):
-        """Выгружаем список продуктов из корзины (формат txt)."""
-        ingredients = (
-            RecipeIngredients.objects.filter(
-                recipe__shoppingcart__user=request.user
+        """Выгружаем список продуктов из корзины (формат txt или pdf).
+        Количества уже просуммированы в итогах корзины. С параметром
+        async=1 большие списки готовит фоновая задача: пока файл
+        не готов, отвечаем 202, клиент повторяет запрос."""
+        rows = cart.cart_rows(request.user.pk)
+        if request.accepted_renderer.format == 'pdf':
+            return self.shopping_cart_pdf(request, rows)
+        filename = 'Список_покупок.txt'
+        if (
+            request.query_params.get('async') == '1'
+            and len(rows) > settings.SHOPPING_LIST_ASYNC_THRESHOLD
+        ):
+            name = cart.export_name(
+                request.user.pk, cart.cart_fingerprint(rows)
+            )
+            storage = cart.export_storage()
+            if storage.exists(name):
+                return FileResponse(
+                    storage.open(name),
+                    as_attachment=True,
+                    filename=filename,
+                    content_type='text/plain',
+                )
+            job = enqueue(
+                'recipes.shopping_list_export',
+                {'user_id': request.user.pk},
+                unique_key=name,
             )
-            .values(
-                'ingredient__name', 'ingredient__measurement_unit', 'amount'
+            return Response(
+                {'job': job.pk, 'status': job.status},
+                status=status.HTTP_202_ACCEPTED,
             )
-            .order_by('ingredient__name')
+        shopping_list = cart.create_ingredient_list(
+            cart.shopping_list_rows(request.user.pk)
         )
-        shopping_list = self.create_ingredient_list(ingredients)
         response = HttpResponse(shopping_list, content_type='text/plain')
         response['Content-Disposition'] = 'attachment; filename={0}'.format(
-            'Список_покупок.txt'
+            filename
         )
         return response
 
-    def create_ingredient_list(self, queryset) -> list:
-        """Доп.функция: создаем список продуктов по рецептам из корзины."""
-        ingredient_data = defaultdict(int)
-        for ingredient in queryset:
-            ingredient_name = ingredient['ingredient__name']
-            measurement_unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['amount']
-            key = f'{ingredient_name} ({measurement_unit})'
-            ingredient_data[key] += amount
-
-        ingredient_list = []
-        ingredient_list.append('Список продуктов: \n')
-        for ingredient, amount in ingredient_data.items():
-            ingredient_list.append(f'{ingredient} - {amount} \n')
-
-        return ingredient_list
+    def shopping_cart_pdf(self, request, rows):
+        """PDF списка покупок. Сверстанный файл хранится по отпечатку
+        корзины: пока корзина не менялась, он отдается без верстки."""
+        name = cart.export_name(
+            request.user.pk, cart.cart_fingerprint(rows), 'pdf'
+        )
+        storage = cart.export_storage()
+        if not storage.exists(name):
+            lines = cart.ingredient_totals(
+                cart.shopping_list_rows(request.user.pk)
+            ).items()
+            try:
+                content = pdf.render_in_pool(lines)
+            except (pdf.PoolBusy, TimeoutError):
+                return rejection(
+                    'Сервер перегружен, повторите позже.',
+                    503,
+                    settings.SHOPPING_LIST_PDF['RETRY_AFTER'],
+                )
+            cart.prune_exports(name)
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(content))
+        return FileResponse(
+            storage.open(name),
+            as_attachment=True,
+            filename='Список_покупок.pdf',
+            content_type='application/pdf',
+        )
 
     def manage_recipe_user(self, request, pk, model, action):
         """Общая функция для создания/удаления связки
@@ -209,21 +577,25 @@ class RecipeViewSet(ModelViewSet):
         """
         recipe = get_object_or_404(Recipe, id=pk)
         if action == 'create':
-            obj, created = model.objects.get_or_create(
-                recipe=recipe, user=request.user
-            )
+            with transaction.atomic():
+                obj, created = model.objects.get_or_create(
+                    recipe=recipe, user=request.user
+                )
+                if created and model is ShoppingCart:
+                    cart.add_recipe(request.user.pk, recipe.pk)
             if not created:
                 return (
                     {"message": f"Уже есть рецепт с id = {pk}."},
                     status.HTTP_400_BAD_REQUEST,
                 )
         elif action == 'delete':
-            try:
-                favorite_recipe = model.objects.get(
+            with transaction.atomic():
+                deleted, _ = model.objects.filter(
                     recipe=recipe, user=request.user
-                )
-                favorite_recipe.delete()
-            except model.DoesNotExist:
+                ).delete()
+                if deleted and model is ShoppingCart:
+                    cart.remove_recipe(request.user.pk, recipe.pk)
+            if not deleted:
                 return (
                     {"message": f"Рецепт с id = {pk} не найден."},
                     status.HTTP_404_NOT_FOUND,
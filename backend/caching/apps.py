@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class CachingConfig(AppConfig):
+    name = 'caching'
+    verbose_name = 'Кеширование'
+
+    def ready(self):
+        from caching import signals  # noqa: F401
@@ -0,0 +1,183 @@
+"""Двухуровневый кеш: LRU в памяти процесса перед общим кешем.
+
+Общий уровень — любой бэкенд Django из CACHES (по умолчанию файловый
+кеш как локальная замена сетевого, его можно заменить на Redis или
+Memcached в настройках). Локальный уровень хранит значения не дольше
+LOCAL_TIMEOUT секунд: удаление в одном воркере не видно локальным
+копиям других, поэтому изменяемые данные кешируются под ключами
+с версиями (caching.versions), а не удаляются.
+
+Счетчики попаданий, промахов и вытеснений копятся в процессе и
+периодически добавляются к общим счетчикам в общем кеше (команда
+cache_stats).
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+STATS = ('local_hits', 'shared_hits', 'misses', 'evictions', 'sets')
+STATS_KEY = 'caching:stats:{}'
+MISSING = object()
+
+
+class LocalLRU:
+    """Ограниченный по числу записей LRU-словарь со сроком жизни.
+    Значения хранятся сериализованными, как в общем кеше: вызывающий
+    код получает копию и может ее изменять."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Значение или MISSING; устаревшая запись удаляется."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout):
+        """Сохраняем значение, возвращаем число вытесненных записей."""
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + timeout)
+            self.entries.move_to_end(key)
+            evicted = 0
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TwoTierCache(BaseCache):
+    """Бэкенд кеша Django. Параметры OPTIONS:
+    SHARED — алиас общего кеша в CACHES, LOCAL_MAX_ENTRIES и
+    LOCAL_TIMEOUT — размер и срок жизни локального уровня,
+    STATS_FLUSH_INTERVAL — период сброса счетчиков в общий кеш."""
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        super().__init__(params)
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.stats_flush_interval = options.get('STATS_FLUSH_INTERVAL', 10)
+        self.local = LocalLRU(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self.stats_lock = threading.Lock()
+        self.stats = dict.fromkeys(STATS, 0)
+        self.stats_flushed_at = time.monotonic()
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def count(self, name, value=1):
+        with self.stats_lock:
+            self.stats[name] += value
+            if (
+                time.monotonic() - self.stats_flushed_at
+                < self.stats_flush_interval
+            ):
+                return
+            pending = self.stats
+            self.stats = dict.fromkeys(STATS, 0)
+            self.stats_flushed_at = time.monotonic()
+        self.flush_stats(pending)
+
+    def flush_stats(self, pending):
+        """Добавляем накопленные счетчики к общим."""
+        for name, value in pending.items():
+            if not value:
+                continue
+            key = STATS_KEY.format(name)
+            self.shared.add(key, 0, timeout=None)
+            try:
+                self.shared.incr(key, value)
+            except ValueError:
+                self.shared.set(key, value, timeout=None)
+
+    def local_set(self, key, value, timeout):
+        local_timeout = self.local_timeout
+        if timeout is not None:
+            local_timeout = min(local_timeout, timeout)
+        if local_timeout > 0:
+            evicted = self.local.set(key, value, local_timeout)
+            if evicted:
+                self.count('evictions', evicted)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version)
+        value = self.local.get(local_key)
+        if value is not MISSING:
+            self.count('local_hits')
+            return value
+        value = self.shared.get(key, MISSING, version=version)
+        if value is MISSING:
+            self.count('misses')
+            return default
+        self.count('shared_hits')
+        self.local_set(local_key, value, None)
+        return value
+
+    def get_many(self, keys, version=None):
+        return {
+            key: value
+            for key in keys
+            if (value := self.get(key, MISSING, version)) is not MISSING
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.get_backend_timeout(timeout)
+        self.shared.set(key, value, timeout=timeout, version=version)
+        self.local_set(self.make_key(key, version), value, timeout)
+        self.count('sets')
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.get_backend_timeout(timeout)
+        added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            self.local_set(self.make_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(
+            key, timeout=self.get_backend_timeout(timeout), version=version
+        )
+
+    def delete(self, key, version=None):
+        self.local.delete(self.make_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.delete(self.make_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version) is not MISSING
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
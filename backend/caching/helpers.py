@@ -0,0 +1,60 @@
+"""Вычисление значений с защитой от одновременного пересчета.
+
+Значение хранится вместе со временем его вычисления и сроком жизни.
+Незадолго до истечения срока отдельные запросы пересчитывают его
+заранее с вероятностью, растущей к концу срока (XFetch), и остальные
+продолжают получать старое значение. При полном промахе пересчет
+выполняет запрос, взявший блокировку в общем кеше, а остальные
+ждут готового значения.
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def should_recompute_early(delta, expires_at, beta):
+    """XFetch: пересчитываем, если now - delta * beta * ln(rand) >= срок."""
+    return (
+        time.time() - delta * beta * math.log(random.random() or 1e-12)
+        >= expires_at
+    )
+
+
+def compute_and_store(key, compute, timeout):
+    started = time.time()
+    value = compute()
+    delta = time.time() - started
+    cache.set(key, (value, delta, time.time() + timeout), timeout=timeout)
+    return value
+
+
+def get_or_compute(key, compute, timeout=None):
+    """Значение из кеша или результат compute(), сохраненный на timeout
+    секунд (по умолчанию CACHING['TIMEOUT'])."""
+    config = settings.CACHING
+    if timeout is None:
+        timeout = config['TIMEOUT']
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires_at = entry
+        if not should_recompute_early(
+            delta, expires_at, config['EARLY_RECOMPUTE_BETA']
+        ):
+            return value
+        return compute_and_store(key, compute, timeout)
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=config['LOCK_TIMEOUT']):
+        try:
+            return compute_and_store(key, compute, timeout)
+        finally:
+            cache.delete(lock_key)
+    deadline = time.monotonic() + config['LOCK_WAIT']
+    while time.monotonic() < deadline:
+        time.sleep(config['LOCK_POLL_INTERVAL'])
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return compute()
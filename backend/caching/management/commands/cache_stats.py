@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from caching.backends import STATS, STATS_KEY
+
+
+class Command(BaseCommand):
+    help = 'Показывает счетчики двухуровневого кеша всех воркеров.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Обнулить счетчики.'
+        )
+
+    def handle(self, *args, **options):
+        shared = caches[settings.CACHING['SHARED']]
+        keys = [STATS_KEY.format(name) for name in STATS]
+        if options['reset']:
+            shared.delete_many(keys)
+            self.stdout.write('Счетчики обнулены.')
+            return
+        stored = shared.get_many(keys)
+        values = {
+            name: stored.get(STATS_KEY.format(name), 0) for name in STATS
+        }
+        for name, value in values.items():
+            self.stdout.write(f'{name}: {value}')
+        hits = values['local_hits'] + values['shared_hits']
+        if hits + values['misses']:
+            ratio = hits / (hits + values['misses'])
+            self.stdout.write(f'hit_ratio: {ratio:.3f}')
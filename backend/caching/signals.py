@@ -0,0 +1,58 @@
+"""Смена версий пространств ключей при изменении данных.
+
+Версии меняются после фиксации транзакции: иначе другой воркер мог бы
+успеть закешировать под новой версией еще старые данные.
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from caching import versions
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.signals import (
+    author_changed,
+    recipe_composition_changed,
+    recipes_touched,
+)
+from users.models import Subscription, User
+
+
+def bump_on_commit(*namespaces):
+    transaction.on_commit(lambda: versions.bump(*namespaces))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(recipe_composition_changed)
+@receiver(recipes_touched)
+def bump_recipes(sender, **kwargs):
+    """Рецепты, их теги и состав входят в ленту и карточки рецептов."""
+    bump_on_commit(versions.RECIPES)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags(sender, **kwargs):
+    bump_on_commit(versions.RECIPES, versions.TAGS)
+
+
+@receiver(post_save, sender=User)
+def bump_authors(sender, instance, **kwargs):
+    """Данные автора входят в ответы ленты. Удаление автора меняет
+    версию через удаление его рецептов."""
+    if author_changed(instance):
+        bump_on_commit(versions.RECIPES)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def bump_user_state(sender, instance, **kwargs):
+    """Избранное, корзина и подписки пользователя."""
+    bump_on_commit(versions.user_state(instance.user_id))
@@ -0,0 +1,118 @@
+"""Версии пространств ключей для инвалидации без удаления.
+
+Ключ данных включает текущие версии пространств, от которых зависят
+данные. Сигналы моделей меняют версию пространства после
+фиксации транзакции, и все воркеры начинают читать новые ключи, а
+старые значения вытесняются по сроку жизни. Версии хранятся в общем
+кеше; процесс помнит прочитанную версию VERSION_LOCAL_TIMEOUT секунд,
+это предел расхождения воркеров после изменения.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+VERSION_KEY = 'caching:version:{}'
+
+# Пространства ключей.
+RECIPES = 'recipes'
+TAGS = 'tags'
+PANTRY = 'pantry'
+
+
+def user_state(user_id):
+    """Избранное, корзина и подписки пользователя."""
+    return f'user-state:{user_id}'
+
+
+local_versions = {}
+local_lock = threading.Lock()
+
+
+def shared_cache():
+    return caches[settings.CACHING['SHARED']]
+
+
+def shared_cache_error():
+    """Почему общий кеш не виден процессам других контейнеров, или None.
+    Версии, измененные фоновой задачей в таком кеше, API не увидит."""
+    alias = settings.CACHING['SHARED']
+    cache = caches[alias]
+    if isinstance(cache, (LocMemCache, DummyCache)):
+        return f'общий кеш {alias!r} хранится в памяти процесса.'
+    if (
+        isinstance(cache, FileBasedCache)
+        and settings.CACHES[alias]['LOCATION']
+        == settings.LOCAL_CACHE_LOCATION
+    ):
+        return (
+            f'общий кеш {alias!r} в каталоге по умолчанию '
+            f'{settings.LOCAL_CACHE_LOCATION}; укажите в CACHE_LOCATION '
+            'каталог, общий с API, или сетевой CACHE_BACKEND.'
+        )
+    return None
+
+
+def new_version():
+    """Версия из текущего времени: не совпадает с прежними, даже если
+    версия была вытеснена из общего кеша или две записи увеличили ее
+    одновременно (в отличие от incr в нескольких бэкендах)."""
+    return time.time_ns()
+
+
+def get_versions(*namespaces, fresh=False):
+    """Текущие версии пространств в порядке аргументов. С fresh=True
+    версии читаются из общего кеша, минуя память процесса."""
+    now = time.monotonic()
+    timeout = 0 if fresh else settings.CACHING['VERSION_LOCAL_TIMEOUT']
+    result = {}
+    with local_lock:
+        for namespace in namespaces:
+            cached = local_versions.get(namespace)
+            if cached is not None and now - cached[1] < timeout:
+                result[namespace] = cached[0]
+    missing = [
+        namespace for namespace in namespaces if namespace not in result
+    ]
+    if missing:
+        cache = shared_cache()
+        stored = cache.get_many(
+            [VERSION_KEY.format(namespace) for namespace in missing]
+        )
+        for namespace in missing:
+            key = VERSION_KEY.format(namespace)
+            version = stored.get(key)
+            if version is None:
+                version = new_version()
+                if not cache.add(key, version, timeout=None):
+                    version = cache.get(key, version)
+            result[namespace] = version
+        with local_lock:
+            for namespace in missing:
+                local_versions[namespace] = (result[namespace], now)
+    return [result[namespace] for namespace in namespaces]
+
+
+def bump(*namespaces):
+    """Меняем версии пространств (старые ключи больше не читаются).
+    Процесс, изменивший данные, видит новую версию сразу."""
+    version = new_version()
+    shared_cache().set_many(
+        {VERSION_KEY.format(namespace): version for namespace in namespaces},
+        timeout=None,
+    )
+    now = time.monotonic()
+    with local_lock:
+        for namespace in namespaces:
+            local_versions[namespace] = (version, now)
+    return version
+
+
+def versioned_key(key, *namespaces):
+    """Ключ с версиями пространств, от которых зависит значение."""
+    versions = '.'.join(map(str, get_versions(*namespaces)))
+    return f'{key}:v{versions}'
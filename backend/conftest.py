@@ -0,0 +1,21 @@
+"""Окружение тестов: SQLite, отдельные каталоги общего кеша и блокировок,
+N+1 и превышение бюджета запросов завершают запрос исключением.
+
+Переменные (уже заданные не меняются) читаются при загрузке настроек,
+поэтому Django настраивается здесь, до импорта тестовых модулей.
+"""
+import os
+import tempfile
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
+os.environ.setdefault('USE_SQLITE', 'true')
+os.environ.setdefault(
+    'CACHE_LOCATION', tempfile.mkdtemp(prefix='foodgram-test-cache-')
+)
+os.environ.setdefault(
+    'ADMISSION_LOCK_DIR', tempfile.mkdtemp(prefix='foodgram-test-admission-')
+)
+os.environ.setdefault('QUERY_INSPECTOR_RAISE', 'true')
+django.setup()
@@ -25,16 +25,38 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
+    'profiling.apps.ProfilingConfig',
+    'sync.apps.SyncConfig',
+    'caching.apps.CachingConfig',
 ]
 
+# Профиль воркера: full — все приложения, api — только API. В профиле
+# api не загружаются админка и import_export (tablib, openpyxl, odfpy,
+# xlwt), что ускоряет запуск и уменьшает память воркера.
+WORKER_PROFILE = os.getenv('WORKER_PROFILE', 'full')
+ADMIN_ENABLED = WORKER_PROFILE != 'api'
+if not ADMIN_ENABLED:
+    INSTALLED_APPS = [
+        app
+        for app in INSTALLED_APPS
+        if app not in ('django.contrib.admin', 'import_export')
+    ]
+
+# Прогрев структур в памяти воркера до приема запросов (wsgi.py).
+WARMUP = os.getenv('WARMUP', 'True').lower() == 'true'
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'profiling.middleware.ProfilerMiddleware',
+    'profiling.detector.QueryInspectorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.AdmissionControlMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram_backend.urls'
@@ -78,6 +100,44 @@ else:
     }
 
 
+# Двухуровневый кеш (caching.backends): LRU в памяти процесса перед
+# общим кешем. Общий уровень по умолчанию файловый, для нескольких
+# серверов его заменяют сетевым (CACHE_BACKEND, CACHE_LOCATION).
+# Каталог по умолчанию виден только своему контейнеру: воркер фоновых
+# задач меняет версии кеша и не запускается, пока CACHE_LOCATION не
+# указывает на каталог, общий с API, или кеш не сетевой.
+LOCAL_CACHE_LOCATION = '/tmp/foodgram-cache'
+CACHES = {
+    'default': {
+        'BACKEND': 'caching.backends.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            'STATS_FLUSH_INTERVAL': 10,
+        },
+    },
+    'shared': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', LOCAL_CACHE_LOCATION),
+    },
+}
+
+CACHING = {
+    'SHARED': 'shared',
+    # Сколько секунд процесс помнит версию пространства ключей.
+    'VERSION_LOCAL_TIMEOUT': 1,
+    'TIMEOUT': 300,
+    # Чем больше, тем раньше пересчитываются значения (XFetch).
+    'EARLY_RECOMPUTE_BETA': 1.0,
+    'LOCK_TIMEOUT': 10,
+    'LOCK_WAIT': 2,
+    'LOCK_POLL_INTERVAL': 0.05,
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -115,9 +175,19 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media'
 
+# Выгрузки списков покупок хранятся вне MEDIA_ROOT (его публично
+# раздает nginx) и отдаются только представлением download_shopping_cart.
+SHOPPING_LIST_EXPORTS_ROOT = os.getenv(
+    'SHOPPING_LIST_EXPORTS_ROOT', '/exports'
+)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
@@ -148,3 +218,119 @@ MAX_LENGTH_NAME = 200
 MAX_LENGTH_HEX = 7
 MAX_LENGTH_EMAIL = 254
 MAX_LENGTH_USERNAME = 150
+
+SIMILAR_RECIPES_LIMIT = 10
+SIMILAR_RECIPES_CHUNK_SIZE = 500
+SIMILAR_RECIPES_TAG_WEIGHT = 0.25
+SIMILAR_RECIPES_MAX_DF = 0.2
+SIMILAR_RECIPES_MIN_DF_LIMIT = 50
+
+PANTRY_INDEX_TTL = 300
+
+ADMISSION_CONTROL = {
+    'ENABLED': os.getenv('ADMISSION_CONTROL', 'True').lower() == 'true',
+    'LOCK_DIR': os.getenv('ADMISSION_LOCK_DIR', '/tmp/foodgram-admission'),
+    'RETRY_AFTER': 2,
+    'DEEP_PAGE': 20,
+    'DEEP_PAGE_ROUTES': ('recipes-list', 'users-subscriptions'),
+    'ROUTES': (
+        ('recipes-download-shopping-cart', ('GET',), 'shopping_list'),
+        ('recipes-list', ('POST',), 'recipe_write'),
+        ('recipes-detail', ('PUT', 'PATCH'), 'recipe_write'),
+    ),
+    # concurrency - одновременных запросов на весь сервер,
+    # burst и rate - емкость и пополнение (в секунду) ведра клиента.
+    'CLASSES': {
+        'shopping_list': {'concurrency': 2, 'burst': 5, 'rate': 0.2},
+        'recipe_write': {'concurrency': 3, 'burst': 10, 'rate': 0.5},
+        'deep_page': {'concurrency': 4, 'burst': 30, 'rate': 2},
+    },
+}
+
+RECIPE_IMAGE_MAX_SIZE = 15 * 1024 * 1024
+
+ADMIN_COUNT_LIMIT = 10000
+
+JOBS = {
+    'CONCURRENCY': int(os.getenv('JOBS_CONCURRENCY', 2)),
+    'MODE': os.getenv('JOBS_MODE', 'thread'),
+    'POLL_INTERVAL': 1,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 10,
+    # Задача, блокировку которой воркер не продлевал LOCK_TIMEOUT секунд,
+    # забирает другой воркер; выполняемые задачи продлеваются
+    # каждые HEARTBEAT_INTERVAL секунд.
+    'LOCK_TIMEOUT': 600,
+    'HEARTBEAT_INTERVAL': 60,
+}
+
+SHOPPING_LIST_ASYNC_THRESHOLD = 200
+
+# Удаление рецептов и пользователей порциями (recipes.deletion).
+# Рецепт, у которого зависимых строк больше ASYNC_THRESHOLD, удаляет
+# фоновая задача.
+DELETION = {
+    'CHUNK_SIZE': 1000,
+    'ASYNC_THRESHOLD': 1000,
+}
+
+# Верстка PDF списка покупок в пуле процессов (recipes.pdf).
+SHOPPING_LIST_PDF = {
+    'WORKERS': 2,
+    'MAX_PENDING': 4,
+    'TIMEOUT': 30,
+    'RETRY_AFTER': 5,
+    'FONT': os.getenv(
+        'SHOPPING_LIST_PDF_FONT',
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    ),
+}
+
+RECIPE_IMAGE_RENDITIONS = {
+    'card': (480, 480),
+    'thumb': (160, 160),
+}
+
+TRENDING = {
+    'HALF_LIFE_HOURS': 72,
+    'INITIAL_WINDOW_HOURS': 24 * 30,
+    'WEIGHTS': {'favorite': 1.0, 'shopping_cart': 1.5},
+    # События учитываются с задержкой, как записи журнала синхронизации.
+    'SETTLE_SECONDS': 5,
+}
+
+# Общий кеш ответов ленты рецептов для анонимных пользователей.
+RESPONSE_CACHE = {
+    'TIMEOUT': 300,
+}
+
+# Наибольшее число рецептов в одном запросе флагов пользователя.
+RECIPE_STATE_MAX_IDS = 100
+
+# Профилирование запросов персонала по требованию.
+PROFILING = {
+    'HEADER': 'HTTP_X_PROFILE',
+    'QUERY_PARAM': '_profile',
+    'TOP_FUNCTIONS': 40,
+    'STACK_DEPTH': 6,
+}
+
+# Поиск N+1 и бюджеты запросов представлений.
+QUERY_INSPECTOR = {
+    'ENABLED': os.getenv('QUERY_INSPECTOR', 'True').lower() == 'true',
+    'RAISE': os.getenv('QUERY_INSPECTOR_RAISE', 'False').lower() == 'true',
+    'REPEAT_THRESHOLD': 5,
+    'STACK_DEPTH': 3,
+}
+
+# Размер порции пересборки снимков рецептов.
+RECIPE_SNAPSHOT_CHUNK_SIZE = 500
+
+# Журнал изменений для инкрементальной синхронизации клиентов.
+SYNC = {
+    'LIMIT': 500,
+    'RETENTION_DAYS': 30,
+}
+
+# Наибольшее число подзапросов в /api/batch/.
+BATCH_MAX_REQUESTS = 20
@@ -1,9 +1,13 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import include, path
 from django.views.generic import TemplateView
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('docs/', TemplateView.as_view(template_name='redoc.html')),
     path('api/', include('api.urls')),
 ]
+
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
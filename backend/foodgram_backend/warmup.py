@@ -0,0 +1,46 @@
+"""Прогрев воркера перед приемом запросов.
+
+Вызывается из wsgi.py при загрузке приложения: импортирует
+представления через резолвер адресов и заранее строит структуры,
+которые иначе строились бы на первом запросе (карта слагов тегов,
+индекс поиска по продуктам). Ошибки прогрева не мешают запуску.
+"""
+import logging
+import time
+
+from django.db import DatabaseError, connections
+from django.urls import get_resolver, resolve
+
+logger = logging.getLogger(__name__)
+
+
+def warm_urls():
+    """Загружаем все маршруты и модули представлений."""
+    get_resolver().reverse_dict
+    resolve('/api/recipes/')
+
+
+def warm_tag_slugs():
+    from recipes.tag_slugs import tag_slugs
+
+    tag_slugs.get()
+
+
+def warm_pantry_index():
+    from recipes.pantry import pantry_index
+
+    pantry_index.build()
+
+
+STEPS = (warm_urls, warm_tag_slugs, warm_pantry_index)
+
+
+def warmup():
+    started = time.perf_counter()
+    for step in STEPS:
+        try:
+            step()
+        except DatabaseError:
+            logger.warning('Прогрев %s пропущен', step.__name__, exc_info=True)
+    connections.close_all()
+    logger.info('Прогрев воркера: %.3f с', time.perf_counter() - started)
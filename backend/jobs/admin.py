@@ -0,0 +1,25 @@
+from django.contrib.admin import ModelAdmin, register
+
+from api.paginators import EstimatedCountPaginator
+from jobs.models import Job
+
+
+@register(Job)
+class JobAdmin(ModelAdmin):
+    """Просмотр фоновых задач в админке."""
+
+    list_display = (
+        'id',
+        'name',
+        'status',
+        'attempts',
+        'run_after',
+        'locked_by',
+        'updated_at',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'unique_key')
+    readonly_fields = ('locked_by', 'locked_at', 'created_at', 'updated_at')
+    empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
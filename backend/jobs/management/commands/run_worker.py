@@ -0,0 +1,86 @@
+import os
+import socket
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from caching.versions import shared_cache_error
+from jobs.queue import claim, reset_connections, run_job
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркер фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.JOBS['CONCURRENCY'],
+            help='Количество задач, выполняемых одновременно.',
+        )
+        parser.add_argument(
+            '--mode',
+            choices=('thread', 'process'),
+            default=settings.JOBS['MODE'],
+            help='Пул потоков или пул процессов.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOBS['POLL_INTERVAL'],
+            help='Пауза между опросами пустой очереди (секунды).',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Выполнить готовые задачи и завершиться.',
+        )
+
+    def handle(self, *args, **options):
+        # Задачи меняют данные, и версии кеша должны дойти до API.
+        error = shared_cache_error()
+        if error is not None:
+            raise CommandError(f'Воркер не запущен: {error}')
+        concurrency = options['concurrency']
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        if options['mode'] == 'process':
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                concurrency, initializer=reset_connections
+            )
+        else:
+            executor = ThreadPoolExecutor(concurrency)
+        self.stdout.write(
+            f'Воркер {worker_id}: {options["mode"]} x {concurrency}.'
+        )
+        in_flight = set()
+        try:
+            while True:
+                free = concurrency - len(in_flight)
+                if free:
+                    for job_id in claim(worker_id, free):
+                        in_flight.add(
+                            executor.submit(run_job, job_id, worker_id)
+                        )
+                if not in_flight:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                done, in_flight = wait(
+                    in_flight,
+                    timeout=options['poll_interval'],
+                    return_when=FIRST_COMPLETED,
+                )
+        except KeyboardInterrupt:
+            self.stdout.write('Останавливаем воркер...')
+        finally:
+            executor.shutdown(wait=True)
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:42
+
+from django.db import migrations, models
+
+
+def clear_duplicate_keys(apps, schema_editor):
+    """Ключ уникальности остается у самой ранней из активных задач
+    с одинаковым ключом, остальные выполняются без ключа."""
+    Job = apps.get_model('jobs', 'Job')
+    active = Job.objects.filter(
+        status__in=['pending', 'running']
+    ).exclude(unique_key='')
+    seen = set()
+    duplicates = []
+    for job_id, unique_key in active.order_by('id').values_list(
+        'id', 'unique_key'
+    ):
+        if unique_key in seen:
+            duplicates.append(job_id)
+        seen.add(unique_key)
+    Job.objects.filter(id__in=duplicates).update(unique_key='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_keys, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='job',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running']), models.Q(('unique_key', ''), _negated=True)), fields=('unique_key',), name='job_unique_active_key'),
+        ),
+    ]
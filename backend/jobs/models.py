@@ -0,0 +1,69 @@
+from django.db.models import (
+    CharField,
+    DateTimeField,
+    Index,
+    JSONField,
+    Model,
+    PositiveIntegerField,
+    Q,
+    TextChoices,
+    TextField,
+    UniqueConstraint,
+)
+from django.utils import timezone
+
+
+class Job(Model):
+    """Модель фоновой задачи."""
+
+    class Status(TextChoices):
+        PENDING = 'pending', 'Ожидает'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    name = CharField(verbose_name='Задача', max_length=200)
+    payload = JSONField(verbose_name='Параметры', default=dict)
+    unique_key = CharField(
+        verbose_name='Ключ уникальности',
+        max_length=200,
+        blank=True,
+        db_index=True,
+    )
+    status = CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = PositiveIntegerField(verbose_name='Попыток', default=0)
+    max_attempts = PositiveIntegerField(verbose_name='Максимум попыток')
+    run_after = DateTimeField(
+        verbose_name='Не раньше', default=timezone.now
+    )
+    locked_by = CharField(verbose_name='Воркер', max_length=200, blank=True)
+    locked_at = DateTimeField(verbose_name='Взята в работу', null=True)
+    result = JSONField(verbose_name='Результат', null=True, blank=True)
+    last_error = TextField(verbose_name='Последняя ошибка', blank=True)
+    created_at = DateTimeField(verbose_name='Создана', auto_now_add=True)
+    updated_at = DateTimeField(verbose_name='Изменена', auto_now=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            Index(fields=['status', 'run_after'], name='job_queue_idx'),
+        ]
+        # Одна ожидающая или выполняемая задача на ключ уникальности.
+        constraints = [
+            UniqueConstraint(
+                fields=['unique_key'],
+                condition=Q(status__in=['pending', 'running'])
+                & ~Q(unique_key=''),
+                name='job_unique_active_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,188 @@
+"""Очередь фоновых задач в базе данных.
+
+Задачи регистрируются декоратором task и ставятся в очередь функцией
+enqueue. Воркер (команда run_worker) забирает готовые задачи через
+SELECT ... FOR UPDATE SKIP LOCKED, а в SQLite, где блокировок строк
+нет, через условный UPDATE каждой строки. Упавшие задачи повторяются
+с экспоненциальной задержкой, пока не исчерпан лимит попыток.
+
+Пока задача выполняется, воркер продлевает ее блокировку (Heartbeat).
+Задачу, блокировка которой не продлевалась LOCK_TIMEOUT секунд (воркер
+упал), забирает другой воркер; результат первого тогда отбрасывается.
+"""
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import (
+    close_old_connections,
+    connection,
+    connections,
+    transaction,
+)
+from django.db.models import Q
+from django.utils import timezone
+
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name):
+    """Регистрируем функцию как фоновую задачу с именем name."""
+
+    def decorator(func):
+        TASKS[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(name, payload=None, unique_key='', max_attempts=None):
+    """Ставим задачу в очередь. Если задача с тем же unique_key еще
+    ожидает или выполняется, возвращаем ее вместо новой: одновременные
+    вызовы разрешает ограничение уникальности job_unique_active_key."""
+    values = {
+        'name': name,
+        'payload': payload or {},
+        'max_attempts': max_attempts or settings.JOBS['MAX_ATTEMPTS'],
+    }
+    if not unique_key:
+        return Job.objects.create(**values)
+    job, _ = Job.objects.filter(
+        status__in=(Job.Status.PENDING, Job.Status.RUNNING)
+    ).get_or_create(unique_key=unique_key, defaults=values)
+    return job
+
+
+def backoff(attempts):
+    """Задержка перед повтором: растет вдвое с каждой попыткой."""
+    return timedelta(
+        seconds=settings.JOBS['BACKOFF_SECONDS'] * 2 ** (attempts - 1)
+    )
+
+
+def ready_jobs(now):
+    """Задачи, готовые к выполнению, включая зависшие у упавших воркеров."""
+    stale = now - timedelta(seconds=settings.JOBS['LOCK_TIMEOUT'])
+    return Job.objects.filter(
+        Q(status=Job.Status.PENDING, run_after__lte=now)
+        | Q(status=Job.Status.RUNNING, locked_at__lt=stale)
+    ).order_by('run_after', 'id')
+
+
+def claim(worker_id, limit):
+    """Забираем до limit задач для воркера, возвращаем их id."""
+    now = timezone.now()
+    lock = {
+        'status': Job.Status.RUNNING,
+        'locked_by': worker_id,
+        'locked_at': now,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job_ids = list(
+                ready_jobs(now)
+                .select_for_update(skip_locked=True)
+                .values_list('id', flat=True)[:limit]
+            )
+            Job.objects.filter(id__in=job_ids).update(**lock)
+        return job_ids
+    job_ids = []
+    for job in ready_jobs(now).values('id', 'status', 'locked_at')[:limit]:
+        claimed = Job.objects.filter(
+            id=job['id'], status=job['status'], locked_at=job['locked_at']
+        ).update(**lock)
+        if claimed:
+            job_ids.append(job['id'])
+    return job_ids
+
+
+def locked(job_id, worker_id):
+    """Задача, блокировку которой держит воркер."""
+    return Job.objects.filter(
+        id=job_id, status=Job.Status.RUNNING, locked_by=worker_id
+    )
+
+
+class Heartbeat(threading.Thread):
+    """Продлевает блокировку задачи каждые HEARTBEAT_INTERVAL секунд,
+    пока задача выполняется."""
+
+    def __init__(self, job_id, worker_id):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+
+    def run(self):
+        interval = settings.JOBS['HEARTBEAT_INTERVAL']
+        try:
+            while not self.stopped.wait(interval):
+                if not locked(self.job_id, self.worker_id).update(
+                    locked_at=timezone.now()
+                ):
+                    return
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_job(job_id, worker_id):
+    """Выполняем задачу, записываем результат или планируем повтор.
+    Результат записывается, только если блокировка не потеряна."""
+    close_old_connections()
+    try:
+        job = locked(job_id, worker_id).first()
+        if job is None:
+            return
+        job.attempts += 1
+        func = TASKS.get(job.name)
+        heartbeat = Heartbeat(job_id, worker_id)
+        heartbeat.start()
+        try:
+            if func is None:
+                raise LookupError(f'Задача {job.name} не зарегистрирована.')
+            job.result = func(**job.payload)
+        except Exception:
+            logger.exception('Ошибка выполнения задачи %s', job)
+            job.last_error = traceback.format_exc()
+            if func is None or job.attempts >= job.max_attempts:
+                job.status = Job.Status.FAILED
+            else:
+                job.status = Job.Status.PENDING
+                job.run_after = timezone.now() + backoff(job.attempts)
+        else:
+            job.status = Job.Status.DONE
+        finally:
+            heartbeat.stop()
+        saved = locked(job_id, worker_id).update(
+            status=job.status,
+            attempts=job.attempts,
+            result=job.result,
+            last_error=job.last_error,
+            run_after=job.run_after,
+            locked_by='',
+            locked_at=None,
+            updated_at=timezone.now(),
+        )
+        if not saved:
+            logger.warning(
+                'Блокировка задачи %s потеряна, результат отброшен', job
+            )
+    finally:
+        close_old_connections()
+
+
+def reset_connections():
+    """Инициализатор дочернего процесса: соединения с базой, унаследованные
+    от родителя при fork, не закрываем, а забываем."""
+    for conn in connections.all():
+        conn.connection = None
@@ -0,0 +1,7 @@
+"""Нагрузочное тестирование API через HTTP.
+
+Запуск против локального сервера:
+
+    python -m loadtest --base-url http://127.0.0.1:8000 \
+        --start 5 --step 5 --max 100 --stage-seconds 30
+"""
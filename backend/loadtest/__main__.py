@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import json
+
+from loadtest.runner import Config, ramp
+from loadtest.scenarios import DEFAULT_MIX
+from loadtest.stats import format_summary
+
+
+def parse_mix(value):
+    """Веса сценариев в виде name=weight,name=weight."""
+    mix = {}
+    for item in value.split(','):
+        name, weight = item.split('=')
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f'Неизвестный сценарий {name}')
+        mix[name] = (DEFAULT_MIX[name][0], float(weight))
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m loadtest',
+        description='Ступенчатая нагрузка на API по смеси сценариев.',
+    )
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument(
+        '--mix',
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help=(
+            'Веса сценариев: browse_feed=50,login=5,... Сценарии: '
+            + ', '.join(DEFAULT_MIX)
+        ),
+    )
+    parser.add_argument('--start', type=int, default=5)
+    parser.add_argument('--step', type=int, default=5)
+    parser.add_argument(
+        '--max', type=int, default=100, dest='max_concurrency'
+    )
+    parser.add_argument('--stage-seconds', type=float, default=30)
+    parser.add_argument(
+        '--think-time',
+        type=float,
+        default=0.0,
+        help='Средняя пауза между сценариями, с.',
+    )
+    parser.add_argument('--accounts', type=int, default=20)
+    parser.add_argument('--p95-limit-ms', type=float, default=1000)
+    parser.add_argument('--min-gain', type=float, default=0.05)
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--json', help='Файл для результатов в JSON.')
+    args = parser.parse_args()
+
+    config = Config(
+        base_url=args.base_url,
+        mix=args.mix,
+        start=args.start,
+        step=args.step,
+        max_concurrency=args.max_concurrency,
+        stage_seconds=args.stage_seconds,
+        think_time=args.think_time,
+        accounts=args.accounts,
+        p95_limit_ms=args.p95_limit_ms,
+        min_gain=args.min_gain,
+        max_error_rate=args.max_error_rate,
+    )
+    stages = []
+
+    def report(concurrency, summary):
+        stages.append({'concurrency': concurrency, **summary})
+        print(format_summary(concurrency, summary), end='\n\n', flush=True)
+
+    result = asyncio.run(ramp(config, report))
+    if result is None:
+        print('Насыщение не достигнуто.')
+    else:
+        concurrency, reason = result
+        print(f'Насыщение при параллельности {concurrency}: {reason}.')
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(
+                {'stages': stages, 'saturation': result},
+                file,
+                ensure_ascii=False,
+                indent=2,
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Подготовка данных, ступенчатое наращивание нагрузки и поиск насыщения.
+
+Каждая ступень держит заданное число виртуальных пользователей в
+течение stage_seconds. Насыщение — первая ступень, на которой
+пропускная способность выросла меньше чем на min_gain относительно
+предыдущей, p95 превысил порог или доля ошибок стала больше допустимой.
+"""
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+
+import httpx
+
+from loadtest.scenarios import Session
+from loadtest.stats import Stats
+
+
+@dataclass
+class Context:
+    """Данные, общие для всех виртуальных пользователей."""
+
+    accounts: list = field(default_factory=list)
+    recipe_ids: list = field(default_factory=list)
+    tag_slugs: list = field(default_factory=list)
+    ingredient_names: list = field(default_factory=list)
+    feed_pages: int = 1
+
+
+@dataclass
+class Config:
+    base_url: str
+    mix: dict
+    start: int = 5
+    step: int = 5
+    max_concurrency: int = 100
+    stage_seconds: float = 30
+    think_time: float = 0.0
+    accounts: int = 20
+    password: str = 'LoadTest-password-1'
+    min_gain: float = 0.05
+    p95_limit_ms: float = 1000
+    max_error_rate: float = 0.01
+    timeout: float = 30
+
+
+async def ensure_account(client, number, password):
+    """Входим под тестовым пользователем, при необходимости
+    регистрируем его. Возвращаем (email, пароль, токен)."""
+    email = f'loadtest{number}@example.com'
+    credentials = {'email': email, 'password': password}
+    response = await client.post('/api/auth/token/login/', json=credentials)
+    if response.status_code != 200:
+        await client.post(
+            '/api/users/',
+            json={
+                **credentials,
+                'username': f'loadtest{number}',
+                'first_name': 'Нагрузка',
+                'last_name': 'Тест',
+            },
+        )
+        response = await client.post(
+            '/api/auth/token/login/', json=credentials
+        )
+        response.raise_for_status()
+    return email, password, response.json()['auth_token']
+
+
+async def get_json(client, url, **kwargs):
+    response = await client.get(url, **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+
+async def prepare(config):
+    """Загружаем справочные данные и тестовые аккаунты."""
+    context = Context()
+    async with httpx.AsyncClient(
+        base_url=config.base_url, timeout=config.timeout
+    ) as client:
+        tags = await get_json(client, '/api/tags/')
+        context.tag_slugs = [tag['slug'] for tag in tags]
+        ingredients = await get_json(client, '/api/ingredients/')
+        context.ingredient_names = [
+            ingredient['name'] for ingredient in ingredients
+        ] or ['а']
+        feed = await get_json(client, '/api/recipes/')
+        page_size = len(feed['results']) or 1
+        context.feed_pages = max(1, -(-feed['count'] // page_size))
+        recipes = await get_json(
+            client, '/api/recipes/', params={'page_size': 100}
+        )
+        context.recipe_ids = [recipe['id'] for recipe in recipes['results']]
+        context.accounts = [
+            await ensure_account(client, number, config.password)
+            for number in range(config.accounts)
+        ]
+    if not context.recipe_ids:
+        raise RuntimeError('В базе нет рецептов для нагрузки.')
+    return context
+
+
+async def virtual_user(session, scenarios, weights, deadline, think_time):
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        scenario = random.choices(scenarios, weights)[0]
+        await scenario(session)
+        if think_time:
+            await asyncio.sleep(random.expovariate(1 / think_time))
+
+
+async def run_stage(config, context, concurrency):
+    """Одна ступень нагрузки: concurrency пользователей stage_seconds."""
+    stats = Stats()
+    scenarios = [scenario for scenario, _ in config.mix.values()]
+    weights = [weight for _, weight in config.mix.values()]
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=config.base_url, timeout=config.timeout, limits=limits
+    ) as client:
+        session = Session(client, stats, context)
+        deadline = asyncio.get_running_loop().time() + config.stage_seconds
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                virtual_user(
+                    session, scenarios, weights, deadline, config.think_time
+                )
+                for _ in range(concurrency)
+            )
+        )
+        duration = time.perf_counter() - started
+    return stats.summary(duration)
+
+
+def saturated(config, previous, current):
+    """Причина насыщения на текущей ступени или None."""
+    total = current['total']
+    if total['requests'] and (
+        (total['errors'] + total['rejected']) / total['requests']
+        > config.max_error_rate
+    ):
+        return 'доля ошибок выше допустимой'
+    if total['p95'] > config.p95_limit_ms:
+        return 'p95 выше порога'
+    if previous is not None and total['rps'] < previous['total']['rps'] * (
+        1 + config.min_gain
+    ):
+        return 'пропускная способность перестала расти'
+    return None
+
+
+async def ramp(config, report):
+    """Наращиваем параллельность до насыщения или максимума.
+    report(concurrency, summary) вызывается после каждой ступени.
+    Возвращаем (параллельность, причина) насыщения или None."""
+    context = await prepare(config)
+    previous = None
+    concurrency = config.start
+    while concurrency <= config.max_concurrency:
+        summary = await run_stage(config, context, concurrency)
+        report(concurrency, summary)
+        reason = saturated(config, previous, summary)
+        if reason:
+            return concurrency, reason
+        previous = summary
+        concurrency += config.step
+    return None
@@ -0,0 +1,137 @@
+"""Сценарии поведения пользователей и их веса в смеси нагрузки.
+
+Сценарий — корутина, принимающая сессию виртуального пользователя.
+Запросы группируются в статистике по имени эндпоинта без id.
+"""
+import random
+import time
+
+import httpx
+
+
+class Session:
+    """Виртуальный пользователь: HTTP-клиент, статистика и общие данные."""
+
+    def __init__(self, client, stats, context):
+        self.client = client
+        self.stats = stats
+        self.context = context
+
+    async def request(self, method, url, name, token=None, **kwargs):
+        """Выполняем запрос и записываем его задержку и исход."""
+        headers = kwargs.pop('headers', {})
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(
+                method, url, headers=headers, **kwargs
+            )
+        except httpx.HTTPError:
+            response = None
+        self.stats.record(
+            f'{method} {name}',
+            (time.perf_counter() - started) * 1000,
+            response.status_code if response is not None else None,
+        )
+        return response
+
+    def account(self):
+        return random.choice(self.context.accounts)
+
+
+async def browse_feed(session):
+    """Аноним листает ленту с фильтром по тегам и открывает рецепт."""
+    context = session.context
+    params = {'page': random.randint(1, context.feed_pages)}
+    if context.tag_slugs and random.random() < 0.5:
+        params['tags'] = random.sample(
+            context.tag_slugs, random.randint(1, len(context.tag_slugs))
+        )
+    response = await session.request(
+        'GET', '/api/recipes/', '/api/recipes/', params=params
+    )
+    if response is None or response.status_code != 200:
+        return
+    results = response.json().get('results', [])
+    if results:
+        recipe_id = random.choice(results)['id']
+        await session.request(
+            'GET', f'/api/recipes/{recipe_id}/', '/api/recipes/{id}/'
+        )
+
+
+async def ingredient_autocomplete(session):
+    """Ввод названия ингредиента по буквам с подсказками."""
+    name = random.choice(session.context.ingredient_names)
+    for length in range(1, min(len(name), 4) + 1):
+        await session.request(
+            'GET',
+            '/api/ingredients/',
+            '/api/ingredients/?name=',
+            params={'name': name[:length]},
+        )
+
+
+async def login(session):
+    """Получение токена по email и паролю."""
+    email, password, _ = session.account()
+    await session.request(
+        'POST',
+        '/api/auth/token/login/',
+        '/api/auth/token/login/',
+        json={'email': email, 'password': password},
+    )
+
+
+async def toggle(session, action):
+    """Добавляем рецепт в избранное или корзину и удаляем обратно."""
+    _, _, token = session.account()
+    recipe_id = random.choice(session.context.recipe_ids)
+    url = f'/api/recipes/{recipe_id}/{action}/'
+    name = f'/api/recipes/{{id}}/{action}/'
+    await session.request('POST', url, name, token=token)
+    await session.request('DELETE', url, name, token=token)
+
+
+async def toggle_favorite(session):
+    await toggle(session, 'favorite')
+
+
+async def toggle_shopping_cart(session):
+    await toggle(session, 'shopping_cart')
+
+
+async def subscriptions(session):
+    """Список подписок с ограничением числа рецептов."""
+    _, _, token = session.account()
+    await session.request(
+        'GET',
+        '/api/users/subscriptions/',
+        '/api/users/subscriptions/',
+        token=token,
+        params={'recipes_limit': random.choice((3, 6))},
+    )
+
+
+async def download_shopping_cart(session):
+    """Выгрузка списка покупок."""
+    _, _, token = session.account()
+    await session.request(
+        'GET',
+        '/api/recipes/download_shopping_cart/',
+        '/api/recipes/download_shopping_cart/',
+        token=token,
+    )
+
+
+# Смесь по умолчанию: сценарий и его вес.
+DEFAULT_MIX = {
+    'browse_feed': (browse_feed, 50),
+    'ingredient_autocomplete': (ingredient_autocomplete, 15),
+    'login': (login, 5),
+    'toggle_favorite': (toggle_favorite, 10),
+    'toggle_shopping_cart': (toggle_shopping_cart, 5),
+    'subscriptions': (subscriptions, 10),
+    'download_shopping_cart': (download_shopping_cart, 5),
+}
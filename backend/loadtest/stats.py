@@ -0,0 +1,87 @@
+"""Сбор задержек и пропускной способности по эндпоинтам."""
+import math
+from collections import defaultdict
+
+PERCENTILES = (50, 90, 95, 99)
+REJECTED_STATUSES = (429, 503)
+
+
+def percentile(sorted_values, rank):
+    """Перцентиль методом ближайшего ранга."""
+    if not sorted_values:
+        return 0.0
+    index = math.ceil(rank / 100 * len(sorted_values)) - 1
+    return sorted_values[max(index, 0)]
+
+
+class EndpointStats:
+    """Задержки (мс) и исходы запросов одного эндпоинта."""
+
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.rejected = 0
+
+    def summary(self, duration):
+        latencies = sorted(self.latencies)
+        total = len(latencies)
+        return {
+            'requests': total,
+            'rps': total / duration if duration else 0.0,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            **{
+                f'p{rank}': percentile(latencies, rank)
+                for rank in PERCENTILES
+            },
+            'max': latencies[-1] if latencies else 0.0,
+        }
+
+
+class Stats:
+    """Статистика ступени нагрузки по всем эндпоинтам."""
+
+    def __init__(self):
+        self.endpoints = defaultdict(EndpointStats)
+
+    def record(self, name, latency_ms, status_code):
+        endpoint = self.endpoints[name]
+        endpoint.latencies.append(latency_ms)
+        if status_code in REJECTED_STATUSES:
+            endpoint.rejected += 1
+        elif status_code is None or status_code >= 500:
+            endpoint.errors += 1
+
+    def total(self):
+        combined = EndpointStats()
+        for endpoint in self.endpoints.values():
+            combined.latencies.extend(endpoint.latencies)
+            combined.errors += endpoint.errors
+            combined.rejected += endpoint.rejected
+        return combined
+
+    def summary(self, duration):
+        return {
+            'endpoints': {
+                name: endpoint.summary(duration)
+                for name, endpoint in sorted(self.endpoints.items())
+            },
+            'total': self.total().summary(duration),
+        }
+
+
+def format_summary(concurrency, summary):
+    """Текстовая таблица результатов ступени."""
+    header = (
+        f'{"эндпоинт":<40} {"запр.":>7} {"rps":>8} {"p50":>8} '
+        f'{"p95":>8} {"p99":>8} {"ошиб.":>6} {"откл.":>6}'
+    )
+    lines = [f'Параллельность {concurrency}', header]
+    rows = [*summary['endpoints'].items(), ('ИТОГО', summary['total'])]
+    for name, row in rows:
+        lines.append(
+            f'{name:<40} {row["requests"]:>7} {row["rps"]:>8.1f} '
+            f'{row["p50"]:>8.1f} {row["p95"]:>8.1f} {row["p99"]:>8.1f} '
+            f'{row["errors"]:>6} {row["rejected"]:>6}'
+        )
+    return '\n'.join(lines)
@@ -0,0 +1,60 @@
+import json
+
+from django.contrib.admin import ModelAdmin, display, register
+from django.utils.html import format_html
+
+from api.paginators import EstimatedCountPaginator
+from profiling.models import ProfileReport
+
+
+@register(ProfileReport)
+class ProfileReportAdmin(ModelAdmin):
+    """Просмотр отчетов профилировщика в админке."""
+
+    list_display = (
+        'id',
+        'created_at',
+        'method',
+        'path',
+        'status_code',
+        'duration_ms',
+        'sql_count',
+        'sql_time_ms',
+        'user',
+    )
+    list_filter = ('method', 'status_code')
+    list_select_related = ('user',)
+    search_fields = ('path',)
+    exclude = ('functions', 'queries')
+    readonly_fields = (
+        'user',
+        'method',
+        'path',
+        'status_code',
+        'duration_ms',
+        'sql_count',
+        'sql_time_ms',
+        'created_at',
+        'functions_report',
+        'queries_report',
+    )
+    empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @display(description='Функции')
+    def functions_report(self, obj):
+        return format_html('<pre>{}</pre>', obj.functions)
+
+    @display(description='Запросы (по нормализованному SQL)')
+    def queries_report(self, obj):
+        return format_html(
+            '<pre>{}</pre>',
+            json.dumps(obj.queries, ensure_ascii=False, indent=2),
+        )
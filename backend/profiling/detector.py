@@ -0,0 +1,98 @@
+"""Поиск N+1 и контроль числа запросов на представление.
+
+Запросы каждого запроса группируются по нормализованному SQL. Если
+запрос одной формы повторился не меньше REPEAT_THRESHOLD раз, это похоже
+на N+1; место вызова снимается только у повторов, начиная
+с REPEAT_THRESHOLD-го. Представления DRF могут
+объявить бюджет запросов по действиям в атрибуте query_budgets:
+
+    query_budgets = {'list': 10, 'subscriptions': 6}
+
+В продакшене нарушения пишутся в лог, с QUERY_INSPECTOR_RAISE=true
+(так запускаются тесты в CI) запрос завершается исключением.
+"""
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from profiling.sql import QueryCollector, normalize_sql
+
+logger = logging.getLogger(__name__)
+
+
+class QueryInspectionError(Exception):
+    """Запрос выполнил повторяющиеся запросы или превысил бюджет."""
+
+
+def repeated_queries(queries, threshold):
+    """Формы SQL, повторившиеся не меньше threshold раз:
+    (SQL, места вызова через «; », число выполнений)."""
+    counts = defaultdict(int)
+    call_sites = defaultdict(dict)
+    for query in queries:
+        sql = normalize_sql(query['sql'])
+        counts[sql] += 1
+        if query['stack']:
+            call_sites[sql][' <- '.join(reversed(query['stack']))] = None
+    return [
+        (sql, '; '.join(call_sites[sql]), count)
+        for sql, count in sorted(
+            counts.items(), key=lambda item: item[1], reverse=True
+        )
+        if count >= threshold
+    ]
+
+
+def view_budget(view_func, method):
+    """Бюджет запросов действия представления DRF или None."""
+    view_class = getattr(view_func, 'cls', None)
+    budgets = getattr(view_class, 'query_budgets', None)
+    if not budgets:
+        return None
+    actions = getattr(view_func, 'actions', None) or {}
+    return budgets.get(actions.get(method.lower()))
+
+
+class QueryInspectorMiddleware:
+    """Проверяет запросы к базе на N+1 и на превышение бюджета."""
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSPECTOR['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.QUERY_INSPECTOR
+        collector = QueryCollector(
+            config['STACK_DEPTH'], stack_after=config['REPEAT_THRESHOLD']
+        )
+        with connection.execute_wrapper(collector):
+            response = self.get_response(request)
+        problems = []
+        for sql, call_site, count in repeated_queries(
+            collector.queries, config['REPEAT_THRESHOLD']
+        ):
+            problems.append(
+                f'Запрос выполнен {count} раз из {call_site or "?"}: {sql}'
+            )
+        budget = getattr(request, '_query_budget', None)
+        if budget is not None and len(collector.queries) > budget:
+            problems.append(
+                f'Выполнено {len(collector.queries)} запросов '
+                f'при бюджете {budget}.'
+            )
+        if problems:
+            message = f'{request.method} {request.path}: ' + ' '.join(
+                problems
+            )
+            if config['RAISE']:
+                raise QueryInspectionError(message)
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = view_budget(view_func, request.method)
+        return None
@@ -0,0 +1,107 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Код дочернего процесса: загружаем WSGI-приложение так же, как gunicorn,
+# и сообщаем время загрузки и пиковую память процесса.
+CHILD_CODE = '''
+import json, resource, time
+started = time.perf_counter()
+from foodgram_backend.wsgi import application
+print(json.dumps({
+    'load': time.perf_counter() - started,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """Собственное время импорта (мкс) по пакетам верхнего уровня."""
+    packages = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line.split(':', 1)[1].split('|')
+        packages[name.strip().split('.')[0]] += int(own)
+    return packages
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет холодный запуск воркера (загрузку WSGI-приложения) '
+        'и память для профилей full и api, показывает самые дорогие '
+        'при импорте пакеты (python -X importtime).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Количество запусков каждого профиля.',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Сколько самых дорогих пакетов показать.',
+        )
+        parser.add_argument(
+            '--profiles',
+            nargs='+',
+            default=['full', 'api'],
+            help='Профили воркера (WORKER_PROFILE).',
+        )
+        parser.add_argument(
+            '--no-warmup',
+            action='store_true',
+            help='Не выполнять прогрев при загрузке приложения.',
+        )
+
+    def run_child(self, profile, warmup):
+        env = {
+            **os.environ,
+            'WORKER_PROFILE': profile,
+            'WARMUP': str(warmup),
+            'DJANGO_SETTINGS_MODULE': 'foodgram_backend.settings',
+        }
+        started = time.perf_counter()
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_CODE],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        result['wall'] = time.perf_counter() - started
+        result['packages'] = parse_importtime(process.stderr)
+        return result
+
+    def handle(self, *args, **options):
+        for profile in options['profiles']:
+            results = [
+                self.run_child(profile, not options['no_warmup'])
+                for _ in range(options['runs'])
+            ]
+            packages = results[-1]['packages']
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Профиль {profile}: запуск процесса '
+                    f'{statistics.median(r["wall"] for r in results):.3f} с, '
+                    'загрузка приложения '
+                    f'{statistics.median(r["load"] for r in results):.3f} с, '
+                    f'импорт {sum(packages.values()) / 1e6:.3f} с, '
+                    f'RSS {max(r["rss_kb"] for r in results) / 1024:.1f} МБ'
+                )
+            )
+            for name, own in packages.most_common(options['top']):
+                self.stdout.write(f'  {own / 1000:9.1f} мс  {name}')
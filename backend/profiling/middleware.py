@@ -0,0 +1,100 @@
+"""Профилирование отдельных запросов по требованию персонала.
+
+Профилирование включается заголовком X-Profile: 1 или параметром
+?_profile=1 и только для персонала. Запрос выполняется под cProfile,
+все SQL-запросы записываются вместе со временем и стеком вызова.
+Отчет сохраняется в базу, ссылка на него в админке (или id отчета,
+если админка отключена) возвращается в заголовке X-Profile-Report.
+Без признака профилирования middleware только проверяет заголовок
+и параметр.
+"""
+import cProfile
+import io
+import pstats
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.urls import reverse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from profiling.models import ProfileReport
+from profiling.sql import QueryCollector
+
+
+def profiling_requested(request):
+    config = settings.PROFILING
+    return (
+        request.META.get(config['HEADER']) == '1'
+        or request.GET.get(config['QUERY_PARAM']) == '1'
+    )
+
+
+def staff_user(request):
+    """Сотрудник, отправивший запрос: по сессии или по токену API.
+    Токен проверяется только для запросов на профилирование."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_staff:
+        return user
+    try:
+        result = TokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    if result is not None and result[0].is_staff:
+        return result[0]
+    return None
+
+
+def top_functions(profiler, limit):
+    """Текст таблицы самых затратных функций."""
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+    return stream.getvalue()
+
+
+class ProfilerMiddleware:
+    """Профилирует запросы персонала по требованию."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling_requested(request):
+            return self.get_response(request)
+        user = staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        return self.profile(request, user)
+
+    def profile(self, request, user):
+        config = settings.PROFILING
+        collector = QueryCollector(config['STACK_DEPTH'])
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with connection.execute_wrapper(collector):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - started
+        report = ProfileReport.objects.create(
+            user=user,
+            method=request.method,
+            path=request.get_full_path()[:2000],
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            sql_count=len(collector.queries),
+            sql_time_ms=collector.total_time * 1000,
+            functions=top_functions(profiler, config['TOP_FUNCTIONS']),
+            queries=collector.grouped(),
+        )
+        if settings.ADMIN_ENABLED:
+            response['X-Profile-Report'] = reverse(
+                'admin:profiling_profilereport_change', args=[report.pk]
+            )
+        else:
+            response['X-Profile-Report'] = str(report.pk)
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.3 on 2026-10-19 09:59
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=2000, verbose_name='Адрес')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('duration_ms', models.FloatField(verbose_name='Время, мс')),
+                ('sql_count', models.PositiveIntegerField(verbose_name='SQL-запросов')),
+                ('sql_time_ms', models.FloatField(verbose_name='Время SQL, мс')),
+                ('functions', models.TextField(verbose_name='Функции')),
+                ('queries', models.JSONField(default=list, verbose_name='Запросы')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='profile_reports', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Отчет профилировщика',
+                'verbose_name_plural': 'Отчеты профилировщика',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db.models import (
+    SET_NULL,
+    CharField,
+    DateTimeField,
+    FloatField,
+    ForeignKey,
+    JSONField,
+    Model,
+    PositiveIntegerField,
+    PositiveSmallIntegerField,
+    TextField,
+)
+
+
+class ProfileReport(Model):
+    """Модель отчета профилировщика запроса."""
+
+    user = ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name='Пользователь',
+        on_delete=SET_NULL,
+        null=True,
+        related_name='profile_reports',
+    )
+    method = CharField(verbose_name='Метод', max_length=10)
+    path = CharField(verbose_name='Адрес', max_length=2000)
+    status_code = PositiveSmallIntegerField(verbose_name='Код ответа')
+    duration_ms = FloatField(verbose_name='Время, мс')
+    sql_count = PositiveIntegerField(verbose_name='SQL-запросов')
+    sql_time_ms = FloatField(verbose_name='Время SQL, мс')
+    functions = TextField(verbose_name='Функции')
+    queries = JSONField(verbose_name='Запросы', default=list)
+    created_at = DateTimeField(verbose_name='Создан', auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        verbose_name = 'Отчет профилировщика'
+        verbose_name_plural = 'Отчеты профилировщика'
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} мс)'
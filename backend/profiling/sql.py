@@ -0,0 +1,116 @@
+"""Сбор SQL-запросов запроса через connection.execute_wrapper.
+
+Запросы группируются по нормализованному тексту: литералы заменяются
+на ?, списки IN (...) любой длины сворачиваются в один элемент. Для
+запросов запоминается место вызова в коде проекта. Снимок стека дорогой
+(traceback читает кадры и строки исходников), поэтому проверка каждого
+запроса в продакшене снимает его только у повторяющихся запросов
+(stack_after), а профилирование по требованию — у всех.
+"""
+import os
+import re
+import time
+import traceback
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+PROJECT_DIR = str(settings.BASE_DIR) + os.sep
+
+
+def normalize_sql(sql):
+    """Форма запроса без конкретных значений параметров."""
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = PLACEHOLDER_LIST.sub('(?)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def project_stack(depth):
+    """Последние depth кадров стека из кода проекта (без библиотек)."""
+    frames = [
+        frame
+        for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(PROJECT_DIR)
+        and 'site-packages' not in frame.filename
+        and not frame.filename.startswith(os.path.dirname(__file__))
+    ]
+    return [
+        f'{os.path.relpath(frame.filename, PROJECT_DIR)}:{frame.lineno} '
+        f'{frame.name}'
+        for frame in frames[-depth:]
+    ]
+
+
+class QueryCollector:
+    """Обертка выполнения запросов: записывает SQL, время и стек.
+    С stack_after стек снимается, только начиная с stack_after-го
+    выполнения одного и того же SQL (у остальных стек пустой)."""
+
+    def __init__(self, stack_depth, stack_after=None):
+        self.stack_depth = stack_depth
+        self.stack_after = stack_after
+        self.executions = Counter()
+        self.queries = []
+
+    def stack(self, sql):
+        if self.stack_after is not None:
+            # Текст с %s одинаков у запросов, отличающихся параметрами,
+            # поэтому нормализовать SQL здесь не нужно.
+            self.executions[sql] += 1
+            if self.executions[sql] < self.stack_after:
+                return []
+        return project_stack(self.stack_depth)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    'sql': sql,
+                    'duration': time.perf_counter() - started,
+                    'stack': self.stack(sql),
+                }
+            )
+
+    @property
+    def total_time(self):
+        return sum(query['duration'] for query in self.queries)
+
+    def grouped(self):
+        """Запросы, сгруппированные по нормализованному SQL, от самых
+        частых к редким; для каждой группы — различные места вызова."""
+        groups = defaultdict(
+            lambda: {'count': 0, 'duration': 0.0, 'call_sites': {}}
+        )
+        for query in self.queries:
+            group = groups[normalize_sql(query['sql'])]
+            group['count'] += 1
+            group['duration'] += query['duration']
+            call_site = ' <- '.join(reversed(query['stack']))
+            group['call_sites'][call_site] = (
+                group['call_sites'].get(call_site, 0) + 1
+            )
+        return sorted(
+            (
+                {
+                    'sql': sql,
+                    'count': group['count'],
+                    'duration_ms': round(group['duration'] * 1000, 3),
+                    'call_sites': [
+                        {'stack': stack, 'count': count}
+                        for stack, count in group['call_sites'].items()
+                    ],
+                }
+                for sql, group in groups.items()
+            ),
+            key=lambda group: (-group['count'], -group['duration_ms']),
+        )
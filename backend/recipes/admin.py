@@ -1,11 +1,19 @@
+from collections import defaultdict
+
 from import_export.admin import ImportExportModelAdmin
 from import_export.resources import ModelResource
 
-from django.contrib.admin import register, ModelAdmin, TabularInline
+from django.contrib import messages
+from django.contrib.admin import display, register, ModelAdmin, TabularInline
+from django.contrib.admin.views.main import ChangeList
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count
 from django.forms.models import BaseInlineFormSet
 
+from api.paginators import EstimatedCountPaginator
 
+from recipes import cart, deletion
 from recipes.models import (
     Favorite,
     Ingredient,
@@ -14,6 +22,7 @@ from recipes.models import (
     ShoppingCart,
     Tag,
 )
+from recipes.signals import recipe_composition_changed
 
 
 class ReceptOne(BaseInlineFormSet):
@@ -33,11 +42,65 @@ class ReceptOne(BaseInlineFormSet):
             )
 
 
+class BackgroundDeleteMixin:
+    """Удаление через фоновую задачу (recipes.deletion) вместо каскада
+    Django. Страница подтверждения не собирает в памяти все связанные
+    объекты, а проверяет только права на удаление cascade_models.
+    schedule_deletion(pk) ставит удаление объекта в очередь."""
+
+    cascade_models = ()
+    schedule_deletion = None
+
+    def get_deleted_objects(self, objs, request):
+        perms_needed = {
+            str(model._meta.verbose_name)
+            for model in self.cascade_models
+            if not request.user.has_perm(
+                f'{model._meta.app_label}.delete_{model._meta.model_name}'
+            )
+        }
+        return [str(obj) for obj in objs], {}, perms_needed, []
+
+    def delete_model(self, request, obj):
+        self.schedule_deletion(obj.pk)
+        self.message_user(
+            request, 'Удаление выполнит фоновая задача.', messages.INFO
+        )
+
+    def delete_queryset(self, request, queryset):
+        for pk in queryset.values_list('pk', flat=True):
+            self.schedule_deletion(pk)
+        self.message_user(
+            request, 'Удаление выполнит фоновая задача.', messages.INFO
+        )
+
+
+class RecipeChangeList(ChangeList):
+    """Число добавлений в избранное считается одним запросом только для
+    рецептов текущей страницы, а не группировкой всей таблицы."""
+
+    def get_results(self, request):
+        super().get_results(request)
+        self.result_list = list(self.result_list)
+        counts = dict(
+            Favorite.objects.filter(
+                recipe_id__in=[recipe.pk for recipe in self.result_list]
+            )
+            .values('recipe_id')
+            .annotate(count=Count('id'))
+            .values_list('recipe_id', 'count')
+            .order_by()
+        )
+        for recipe in self.result_list:
+            recipe.favorites_count = counts.get(recipe.pk, 0)
+
+
 class RecipeIngredientInline(TabularInline):
     model = RecipeIngredients
     extra = 0
     min_num = 1
     formset = ReceptOne
+    autocomplete_fields = ('ingredient',)
 
 
 class TagInline(TabularInline):
@@ -46,15 +109,47 @@ class TagInline(TabularInline):
 
 
 @register(Recipe)
-class RecipeAdmin(ModelAdmin):
+class RecipeAdmin(BackgroundDeleteMixin, ModelAdmin):
     """Управление рецептами в админке."""
 
     inlines = [RecipeIngredientInline]
-
-    list_display = ('id', 'name', 'author', 'text', 'cooking_time', 'pub_date')
-    search_fields = ('name', 'author')
-    list_filter = ('name', 'author', 'tags')
+    cascade_models = (RecipeIngredients, Favorite, ShoppingCart)
+
+    list_display = (
+        'id',
+        'name',
+        'author',
+        'text',
+        'cooking_time',
+        'pub_date',
+        'favorites_count',
+    )
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username')
+    list_filter = ('tags',)
+    autocomplete_fields = ('author', 'tags')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return RecipeChangeList
+
+    schedule_deletion = staticmethod(deletion.schedule_recipe_deletion)
+
+    @display(description='В избранном')
+    def favorites_count(self, obj):
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        old_amounts = cart.recipe_amounts(form.instance.pk) if change else {}
+        super().save_related(request, form, formsets, change)
+        recipe_composition_changed.send(
+            sender=Recipe,
+            recipe=form.instance,
+            created=not change,
+            old_amounts=old_amounts,
+        )
 
 
 @register(Tag)
@@ -79,10 +174,12 @@ class IngredientAdmin(ImportExportModelAdmin):
     """Управление ингредиентами в админке."""
 
     list_display = ('id', 'name', 'measurement_unit')
-    search_fields = ('name', 'measurement_unit')
-    list_filter = ('name', 'measurement_unit')
+    search_fields = ('name',)
+    list_filter = ('measurement_unit',)
     empty_value_display = '-пусто-'
     resource_class = IngredientResource
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @register(RecipeIngredients)
@@ -90,9 +187,12 @@ class RecipeIngredientsAdmin(ModelAdmin):
     """Управление ингредиентами в рецептах в админке."""
 
     list_display = ('id', 'recipe', 'ingredient', 'amount')
-    search_fields = ('recipe', 'ingredient')
-    list_filter = ('recipe', 'ingredient')
+    list_select_related = ('recipe', 'ingredient')
+    search_fields = ('recipe__name', 'ingredient__name')
+    autocomplete_fields = ('recipe', 'ingredient')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @register(Favorite)
@@ -100,9 +200,12 @@ class FavoriteAdmin(ModelAdmin):
     """Управление избранными рецептами в админке."""
 
     list_display = ('id', 'user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @register(ShoppingCart)
@@ -110,6 +213,42 @@ class ShoppingCartAdmin(ModelAdmin):
     """Управление корзиной покупок в админке."""
 
     list_display = ('id', 'user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def save_model(self, request, obj, form, change):
+        """Переносим добавление (или замену) рецепта в итоги корзины."""
+        old = None
+        if change:
+            old = (
+                ShoppingCart.objects.filter(pk=obj.pk)
+                .values_list('user_id', 'recipe_id')
+                .first()
+            )
+        super().save_model(request, obj, form, change)
+        new = (obj.user_id, obj.recipe_id)
+        if old != new:
+            if old is not None:
+                cart.remove_recipe(*old)
+            cart.add_recipe(*new)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            cart.remove_recipe(obj.user_id, obj.recipe_id)
+
+    def delete_queryset(self, request, queryset):
+        """Вычитаем удаляемые строки из итогов корзин, по рецепту."""
+        user_ids = defaultdict(list)
+        with transaction.atomic():
+            for user_id, recipe_id in queryset.values_list(
+                'user_id', 'recipe_id'
+            ):
+                user_ids[recipe_id].append(user_id)
+            super().delete_queryset(request, queryset)
+            for recipe_id, users in user_ids.items():
+                cart.apply_delta(users, cart.recipe_amounts(recipe_id), {})
@@ -0,0 +1,208 @@
+"""Инкрементальное ведение итогов корзины покупок.
+
+Для каждого пользователя хранится сумма каждого ингредиента по всем
+рецептам в его корзине. Изменения применяются как разность между
+старым и новым составом, поэтому выгрузка списка покупок читает уже
+просуммированные строки.
+"""
+import hashlib
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import Case, F, Sum, When
+from django.utils.crypto import salted_hmac
+
+from recipes.models import (
+    RecipeIngredients,
+    ShoppingCart,
+    ShoppingCartIngredient,
+)
+
+
+def recipe_amounts(recipe_id):
+    """Состав рецепта в виде {id ингредиента: количество}."""
+    return dict(
+        RecipeIngredients.objects.filter(recipe_id=recipe_id)
+        .values_list('ingredient_id', 'amount')
+        .order_by()
+    )
+
+
+def apply_delta(user_ids, old_amounts, new_amounts):
+    """Применяем к итогам корзин пользователей разность составов."""
+    user_ids = list(user_ids)
+    delta = {
+        ingredient_id: new_amounts.get(ingredient_id, 0)
+        - old_amounts.get(ingredient_id, 0)
+        for ingredient_id in old_amounts.keys() | new_amounts.keys()
+    }
+    delta = {key: value for key, value in delta.items() if value}
+    if not user_ids or not delta:
+        return
+    with transaction.atomic():
+        ShoppingCartIngredient.objects.bulk_create(
+            [
+                ShoppingCartIngredient(
+                    user_id=user_id, ingredient_id=ingredient_id
+                )
+                for user_id in user_ids
+                for ingredient_id, value in delta.items()
+                if value > 0
+            ],
+            ignore_conflicts=True,
+        )
+        ShoppingCartIngredient.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=delta
+        ).update(
+            amount=Case(
+                *(
+                    When(ingredient_id=key, then=F('amount') + value)
+                    for key, value in delta.items()
+                ),
+                default=F('amount'),
+            )
+        )
+        ShoppingCartIngredient.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=delta, amount__lte=0
+        ).delete()
+
+
+def add_recipe(user_id, recipe_id):
+    """Рецепт добавлен в корзину пользователя."""
+    apply_delta([user_id], {}, recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_id, recipe_id):
+    """Рецепт удален из корзины пользователя."""
+    apply_delta([user_id], recipe_amounts(recipe_id), {})
+
+
+def recipe_changed(recipe_id, old_amounts):
+    """Состав рецепта изменился: пересчитываем корзины, где он лежит."""
+    user_ids = ShoppingCart.objects.filter(recipe_id=recipe_id).values_list(
+        'user_id', flat=True
+    )
+    apply_delta(user_ids, old_amounts, recipe_amounts(recipe_id))
+
+
+def computed_totals(user_ids=None):
+    """Полный пересчет итогов корзин:
+    {id пользователя: {id ингредиента: количество}}."""
+    rows = RecipeIngredients.objects.filter(
+        recipe__shoppingcart__isnull=False
+    )
+    if user_ids is not None:
+        rows = rows.filter(recipe__shoppingcart__user_id__in=user_ids)
+    totals = defaultdict(dict)
+    for user_id, ingredient_id, amount in (
+        rows.values_list('recipe__shoppingcart__user_id', 'ingredient_id')
+        .annotate(total=Sum('amount'))
+        .order_by()
+    ):
+        totals[user_id][ingredient_id] = amount
+    return totals
+
+
+def stored_totals(user_ids=None):
+    """Итоги корзин из таблицы в том же виде, что и computed_totals."""
+    rows = ShoppingCartIngredient.objects.all()
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    totals = defaultdict(dict)
+    for user_id, ingredient_id, amount in rows.values_list(
+        'user_id', 'ingredient_id', 'amount'
+    ):
+        totals[user_id][ingredient_id] = amount
+    return totals
+
+
+def rebuild_totals(user_ids):
+    """Перезаписываем итоги корзин пользователей полным пересчетом."""
+    totals = computed_totals(user_ids)
+    with transaction.atomic():
+        ShoppingCartIngredient.objects.filter(user_id__in=user_ids).delete()
+        ShoppingCartIngredient.objects.bulk_create(
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            )
+            for user_id, amounts in totals.items()
+            for ingredient_id, amount in amounts.items()
+        )
+
+
+def cart_rows(user_id):
+    """Итоги корзины пользователя: [(id ингредиента, количество), ...]."""
+    return list(
+        ShoppingCartIngredient.objects.filter(user_id=user_id, amount__gt=0)
+        .values_list('ingredient_id', 'amount')
+        .order_by('ingredient_id')
+    )
+
+
+def cart_fingerprint(rows):
+    """Отпечаток содержимого корзины по ее итогам."""
+    digest = hashlib.sha1()
+    for ingredient_id, amount in rows:
+        digest.update(f'{ingredient_id}:{amount};'.encode())
+    return digest.hexdigest()
+
+
+def shopping_list_rows(user_id):
+    """Строки списка покупок, отсортированные по названию ингредиента."""
+    return (
+        ShoppingCartIngredient.objects.filter(user_id=user_id, amount__gt=0)
+        .values('ingredient__name', 'ingredient__measurement_unit', 'amount')
+        .order_by('ingredient__name')
+    )
+
+
+def ingredient_totals(queryset):
+    """Количества по строкам «ингредиент (единица)» из shopping_list_rows."""
+    ingredient_data = defaultdict(int)
+    for ingredient in queryset:
+        ingredient_name = ingredient['ingredient__name']
+        measurement_unit = ingredient['ingredient__measurement_unit']
+        amount = ingredient['amount']
+        key = f'{ingredient_name} ({measurement_unit})'
+        ingredient_data[key] += amount
+    return ingredient_data
+
+
+def create_ingredient_list(queryset):
+    """Создаем текстовый список продуктов по итогам корзины."""
+    ingredient_list = []
+    ingredient_list.append('Список продуктов: \n')
+    for ingredient, amount in ingredient_totals(queryset).items():
+        ingredient_list.append(f'{ingredient} - {amount} \n')
+
+    return ingredient_list
+
+
+def export_storage():
+    """Закрытое хранилище выгрузок списков покупок."""
+    return FileSystemStorage(location=settings.SHOPPING_LIST_EXPORTS_ROOT)
+
+
+def export_name(user_id, fingerprint, extension='txt'):
+    """Имя файла выгрузки в export_storage. Отпечаток корзины можно
+    вычислить по открытым данным рецептов, поэтому имя — HMAC
+    с секретным ключом сервера."""
+    digest = salted_hmac(
+        'recipes.cart.export_name', f'{user_id}:{fingerprint}'
+    ).hexdigest()
+    return f'{user_id}/{digest}.{extension}'
+
+
+def prune_exports(name):
+    """Удаляем прежние выгрузки пользователя в том же формате, что name."""
+    storage = export_storage()
+    directory, current = os.path.split(name)
+    extension = os.path.splitext(current)[1]
+    if not storage.exists(directory):
+        return
+    for filename in storage.listdir(directory)[1]:
+        if filename != current and filename.endswith(extension):
+            storage.delete(f'{directory}/{filename}')
@@ -0,0 +1,144 @@
+"""Удаление рецептов и пользователей порциями.
+
+Каскадное удаление Django собирает все зависимые строки в памяти
+процесса и удаляет их в одной транзакции запросами с огромными
+списками IN: у популярного рецепта или активного автора это сотни
+тысяч строк избранного, корзин и журнала синхронизации и блокировки
+таблиц на секунды. Здесь многочисленные зависимые строки удаляются
+порциями по DELETION['CHUNK_SIZE'], каждая в своей транзакции и с
+обычными сигналами (журнал синхронизации, версии кеша), а сам объект
+удаляется последним, когда зависимых строк у него почти не осталось.
+Пользователь сначала деактивируется, остальное делает фоновая задача.
+"""
+from django.conf import settings
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+
+from jobs.queue import enqueue
+from recipes import cart
+from recipes.signals import touch_recipes
+from recipes.models import (
+    Favorite,
+    Recipe,
+    ShoppingCart,
+    ShoppingCartIngredient,
+    SimilarRecipe,
+)
+from sync.models import Change
+from users.models import Subscription, User
+
+
+def delete_in_chunks(queryset, before=None):
+    """Удаляем строки queryset порциями. before(rows) вызывается
+    в транзакции порции до удаления. Возвращаем число удаленных строк."""
+    chunk_size = settings.DELETION['CHUNK_SIZE']
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(
+            queryset.order_by().values_list('pk', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            rows = model.objects.filter(pk__in=ids)
+            if before is not None:
+                before(rows)
+            deleted += rows.delete()[0]
+
+
+def subtract_from_cart_totals(recipe_id):
+    """Вычитаем рецепт из итогов корзин удаляемых строк корзины."""
+    amounts = cart.recipe_amounts(recipe_id)
+
+    def before(rows):
+        cart.apply_delta(rows.values_list('user_id', flat=True), amounts, {})
+
+    return before
+
+
+def mark_neighbors_stale(rows):
+    """Рецепты, из списков которых удаляется рецепт, пересчитываются
+    при следующем запуске build_similar_recipes."""
+    Recipe.objects.filter(
+        id__in=rows.values_list('recipe_id', flat=True)
+    ).update(similar_computed_at=None)
+
+
+def recipe_fanout(recipe_id):
+    """Число зависимых строк рецепта, которые удаляются порциями."""
+    return (
+        Favorite.objects.filter(recipe_id=recipe_id).count()
+        + ShoppingCart.objects.filter(recipe_id=recipe_id).count()
+        + SimilarRecipe.objects.filter(similar_id=recipe_id).count()
+    )
+
+
+def delete_recipe(recipe_id):
+    """Удаляем рецепт: корзины (с итогами), избранное и ссылки из
+    похожих рецептов порциями, затем сам рецепт с его составом."""
+    deleted = delete_in_chunks(
+        ShoppingCart.objects.filter(recipe_id=recipe_id),
+        before=subtract_from_cart_totals(recipe_id),
+    )
+    deleted += delete_in_chunks(Favorite.objects.filter(recipe_id=recipe_id))
+    deleted += delete_in_chunks(
+        SimilarRecipe.objects.filter(similar_id=recipe_id),
+        before=mark_neighbors_stale,
+    )
+    with transaction.atomic():
+        deleted += Recipe.objects.filter(pk=recipe_id).delete()[0]
+    return deleted
+
+
+def delete_user(user_id):
+    """Удаляем пользователя: его рецепты по одному, затем избранное,
+    корзину, подписки и журнал синхронизации порциями."""
+    deleted = 0
+    recipe_ids = list(
+        Recipe.objects.filter(author_id=user_id)
+        .values_list('id', flat=True)
+        .order_by('id')
+    )
+    for recipe_id in recipe_ids:
+        deleted += delete_recipe(recipe_id)
+    for queryset in (
+        Favorite.objects.filter(user_id=user_id),
+        ShoppingCart.objects.filter(user_id=user_id),
+        ShoppingCartIngredient.objects.filter(user_id=user_id),
+        Subscription.objects.filter(user_id=user_id),
+        Subscription.objects.filter(author_id=user_id),
+        Change.objects.filter(user_id=user_id),
+    ):
+        deleted += delete_in_chunks(queryset)
+    with transaction.atomic():
+        deleted += User.objects.filter(pk=user_id).delete()[0]
+    return deleted
+
+
+def schedule_recipe_deletion(recipe_id):
+    return enqueue(
+        'recipes.delete_recipe',
+        {'recipe_id': recipe_id},
+        unique_key=f'delete-recipe:{recipe_id}',
+    )
+
+
+def schedule_user_deletion(user_id):
+    """Деактивируем пользователя и отзываем его токены (вход и запросы
+    от его имени сразу невозможны), удаление ставим в очередь. Рецепты
+    неактивного автора скрыты из ленты сразу: отмечаем их изменение для
+    кеша ответов и журнала синхронизации."""
+    with transaction.atomic():
+        User.objects.filter(pk=user_id).update(is_active=False)
+        Token.objects.filter(user_id=user_id).delete()
+        touch_recipes(
+            Recipe.objects.filter(author_id=user_id).values_list(
+                'id', flat=True
+            )
+        )
+        return enqueue(
+            'users.delete_user',
+            {'user_id': user_id},
+            unique_key=f'delete-user:{user_id}',
+        )
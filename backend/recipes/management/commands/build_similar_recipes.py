@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.similarity import (
+    SimilarityIndex,
+    merge_into_neighbors,
+    rebuild_similar_recipes,
+    stale_recipe_ids,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Рассчитывает похожие рецепты. По умолчанию пересчитываются только '
+        'новые и измененные рецепты, с флагом --full весь каталог.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать соседей для всех рецептов.',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=settings.SIMILAR_RECIPES_LIMIT,
+            help='Количество похожих рецептов на один рецепт.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=settings.SIMILAR_RECIPES_CHUNK_SIZE,
+            help='Количество рецептов, записываемых в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        index = SimilarityIndex.load()
+        if options['full']:
+            recipe_ids = list(
+                Recipe.objects.values_list('id', flat=True).order_by('id')
+            )
+        else:
+            recipe_ids = stale_recipe_ids()
+        processed = rebuild_similar_recipes(
+            index, recipe_ids, options['limit'], options['chunk_size']
+        )
+        if not options['full'] and recipe_ids:
+            merge_into_neighbors(index, set(recipe_ids), options['limit'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитано рецептов: {processed}.')
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from recipes import snapshots
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает снимки тегов, состава и автора рецептов. '
+        'По умолчанию только отсутствующие, с --all все.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересобрать снимки всех рецептов (исправить расхождения).',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by('id')
+        if not options['all']:
+            recipes = recipes.filter(snapshot={})
+        updated = snapshots.rebuild(recipes.values_list('id', flat=True))
+        self.stdout.write(
+            self.style.SUCCESS(f'Обновлено снимков: {updated}.')
+        )
@@ -0,0 +1,87 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.tasks import rendition_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы изображений рецептов, на которые не ссылается '
+        'ни один рецепт, и уменьшенные копии таких изображений.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=float,
+            default=24,
+            help=(
+                'Не удалять файлы моложе указанного возраста: они могут '
+                'принадлежать рецепту, который еще сохраняется.'
+            ),
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только вывести файлы, которые будут удалены.',
+        )
+
+    def walk(self, storage, directory):
+        """Доп.функция: обходим каталог хранилища рекурсивно."""
+        directories, files = storage.listdir(directory)
+        for name in files:
+            yield f'{directory}/{name}'
+        for name in directories:
+            yield from self.walk(storage, f'{directory}/{name}')
+
+    def sweep(self, storage, directory, keep, threshold, dry_run):
+        """Доп.функция: удаляем файлы каталога, которых нет в keep и
+        которые старше threshold. Возвращаем число удаленных."""
+        if not storage.exists(directory):
+            return 0
+        removed = 0
+        for name in self.walk(storage, directory):
+            if name in keep:
+                continue
+            if os.path.getmtime(storage.path(name)) > threshold:
+                continue
+            if dry_run:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+            removed += 1
+        return removed
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        referenced = set(
+            Recipe.objects.exclude(image='').values_list('image', flat=True)
+        )
+        renditions = {
+            rendition_name(image, size_name)
+            for image in referenced
+            for size_name in settings.RECIPE_IMAGE_RENDITIONS
+        }
+        threshold = time.time() - options['grace_hours'] * 3600
+        removed = self.sweep(
+            field.storage,
+            field.upload_to.rstrip('/'),
+            referenced,
+            threshold,
+            options['dry_run'],
+        )
+        removed += self.sweep(
+            default_storage,
+            'renditions',
+            renditions,
+            threshold,
+            options['dry_run'],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Неиспользуемых файлов: {removed}.')
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import update_trending
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет популярность рецептов по добавлениям в избранное и '
+        'корзину с прошлого запуска. Запускается периодически (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Количество рецептов, обновляемых в одной транзакции.',
+        )
+
+    def handle(self, *args, **options):
+        updated = update_trending(options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Обновлено рецептов: {updated}.')
+        )
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from recipes.cart import computed_totals, rebuild_totals, stored_totals
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет итоги корзин покупок с полным пересчетом по рецептам. '
+        'С флагом --fix перезаписывает расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Пересчитать итоги для пользователей с расхождениями.',
+        )
+
+    def handle(self, *args, **options):
+        expected = computed_totals()
+        actual = stored_totals()
+        mismatched = sorted(
+            user_id
+            for user_id in expected.keys() | actual.keys()
+            if expected.get(user_id, {}) != actual.get(user_id, {})
+        )
+        for user_id in mismatched:
+            self.stdout.write(
+                f'Пользователь {user_id}: ожидалось '
+                f'{expected.get(user_id, {})}, в таблице '
+                f'{actual.get(user_id, {})}.'
+            )
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+        if options['fix']:
+            rebuild_totals(mismatched)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Исправлено корзин: {len(mismatched)}.'
+                )
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Корзин с расхождениями: {len(mismatched)}.'
+                )
+            )
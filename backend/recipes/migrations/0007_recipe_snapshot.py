@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='snapshot',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Снимок тегов, состава и автора'),
+        ),
+    ]
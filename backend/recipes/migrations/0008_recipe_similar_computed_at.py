@@ -0,0 +1,29 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:32
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_similar_computed_at(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.filter(similar_recipes__isnull=False).update(
+        similar_computed_at=timezone.now()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='similar_computed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата расчета похожих рецептов'),
+        ),
+        migrations.RunPython(
+            fill_similar_computed_at, migrations.RunPython.noop
+        ),
+    ]
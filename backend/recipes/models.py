@@ -4,16 +4,22 @@ from django.db.models import (
     CASCADE,
     CharField,
     DateTimeField,
+    FloatField,
     ForeignKey,
     ImageField,
+    Index,
+    IntegerField,
+    JSONField,
     ManyToManyField,
     Model,
+    OneToOneField,
     PositiveIntegerField,
     SlugField,
     TextField,
     UniqueConstraint,
 )
 
+from recipes.storage import ContentAddressedStorage
 from users.models import User
 
 
@@ -93,7 +99,9 @@ class Recipe(Model):
         through='RecipeIngredients',
     )
     image = ImageField(
-        verbose_name='Изображение рецепта', upload_to='recipes/'
+        verbose_name='Изображение рецепта',
+        upload_to='recipes/',
+        storage=ContentAddressedStorage(),
     )
     name = CharField(
         verbose_name='Название рецепта', max_length=settings.MAX_LENGTH_NAME
@@ -108,6 +116,21 @@ class Recipe(Model):
         ],
     )
     pub_date = DateTimeField(verbose_name='Дата публикации', auto_now_add=True)
+    updated_at = DateTimeField(
+        verbose_name='Дата изменения', auto_now=True, db_index=True
+    )
+    snapshot = JSONField(
+        verbose_name='Снимок тегов, состава и автора',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    similar_computed_at = DateTimeField(
+        verbose_name='Дата расчета похожих рецептов',
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         ordering = ['-pub_date', 'name']
@@ -184,6 +207,14 @@ class BaseInteractionModel(Model):
         verbose_name='Рецепт',
         on_delete=CASCADE,
     )
+    # Пусто у записей, созданных до появления поля: их дата неизвестна,
+    # и в расчет популярности они не попадают.
+    created_at = DateTimeField(
+        verbose_name='Дата добавления',
+        auto_now_add=True,
+        null=True,
+        db_index=True,
+    )
 
     class Meta:
         abstract = True
@@ -211,3 +242,114 @@ class ShoppingCart(BaseInteractionModel):
     class Meta:
         verbose_name = 'Корзина покупок'
         verbose_name_plural = 'Корзины покупок'
+
+
+class SimilarRecipe(Model):
+    """Модель предрассчитанных похожих рецептов."""
+
+    recipe = ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=CASCADE,
+        related_name='similar_recipes',
+    )
+    similar = ForeignKey(
+        Recipe,
+        verbose_name='Похожий рецепт',
+        on_delete=CASCADE,
+        related_name='similar_to',
+    )
+    score = FloatField(verbose_name='Степень сходства')
+
+    class Meta:
+        ordering = ['recipe', '-score']
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            UniqueConstraint(
+                fields=['recipe', 'similar'],
+                name='уникальность_сочетания_рецепт_похожий_рецепт',
+            )
+        ]
+        indexes = [
+            Index(
+                fields=['recipe', '-score'], name='similar_recipe_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar} ({self.score:.2f})'
+
+
+class ShoppingCartIngredient(Model):
+    """Модель суммарного количества ингредиента в корзине пользователя.
+    Поддерживается инкрементально при изменении корзины и рецептов."""
+
+    user = ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=CASCADE,
+        related_name='shopping_cart_ingredients',
+    )
+    ingredient = ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=CASCADE,
+        related_name='shopping_cart_totals',
+    )
+    amount = IntegerField(verbose_name='Общее количество', default=0)
+
+    class Meta:
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзинах'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='уникальность_сочетания_пользователь_ингредиент',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} – {self.amount}'
+
+
+class RecipeTrend(Model):
+    """Модель популярности рецепта с затуханием во времени.
+
+    В score хранится сумма весов событий, приведенных к началу отсчета
+    (Checkpoint 'trending_epoch'), поэтому порядок рецептов по score
+    совпадает с порядком по текущей затухающей популярности и
+    не требует пересчета всех строк."""
+
+    recipe = OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name='trend',
+    )
+    score = FloatField(verbose_name='Популярность', default=0)
+
+    class Meta:
+        verbose_name = 'Популярность рецепта'
+        verbose_name_plural = 'Популярность рецептов'
+        indexes = [Index(fields=['-score'], name='recipe_trend_score_idx')]
+
+    def __str__(self):
+        return f'{self.recipe}: {self.score:.3g}'
+
+
+class Checkpoint(Model):
+    """Модель контрольной точки периодических задач."""
+
+    key = CharField(
+        verbose_name='Ключ', max_length=settings.MAX_LENGTH_NAME, unique=True
+    )
+    value = DateTimeField(verbose_name='Значение')
+
+    class Meta:
+        verbose_name = 'Контрольная точка'
+        verbose_name_plural = 'Контрольные точки'
+
+    def __str__(self):
+        return f'{self.key}: {self.value}'
@@ -0,0 +1,156 @@
+"""Инвертированный индекс «ингредиент -> рецепты» для поиска по продуктам.
+
+Множества рецептов хранятся битовыми картами (целое число, в котором
+бит с позицией рецепта выставлен, если ингредиент входит в рецепт).
+Позиции выдаются рецептам подряд при сборке индекса, а не берутся из id:
+иначе при больших id и удаленных рецептах карты растут вместе
+с максимальным id. Позиции удаленных рецептов освобождаются при
+следующей сборке. Индекс живет в памяти процесса и обновляется после
+фиксации транзакции, изменившей состав рецепта.
+Воркер, изменивший состав, меняет версию пространства pantry в общем
+кеше, и остальные воркеры перестраивают индекс при следующем поиске;
+по истечении PANTRY_INDEX_TTL индекс перестраивается в любом случае.
+"""
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from caching import versions
+from recipes.models import RecipeIngredients
+
+
+def iter_bits(bitmap):
+    """Доп.функция: перебираем номера выставленных битов."""
+    while bitmap:
+        lowest = bitmap & -bitmap
+        yield lowest.bit_length() - 1
+        bitmap ^= lowest
+
+
+class PantryIndex:
+    """Индекс рецептов по ингредиентам."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bitmaps = {}
+        self.recipes = {}
+        self.positions = {}
+        self.recipe_ids = []
+        self.built_at = None
+        self.version = None
+
+    def is_fresh(self):
+        return (
+            self.built_at is not None
+            and time.monotonic() - self.built_at < settings.PANTRY_INDEX_TTL
+            and self.version == versions.get_versions(versions.PANTRY)[0]
+        )
+
+    def build(self):
+        """Строим индекс одним запросом к составу рецептов. Версия
+        читается до запроса: изменение во время сборки приведет
+        к повторной сборке."""
+        [version] = versions.get_versions(versions.PANTRY, fresh=True)
+        recipes = defaultdict(set)
+        rows = RecipeIngredients.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).order_by()
+        for recipe_id, ingredient_id in rows.iterator():
+            recipes[recipe_id].add(ingredient_id)
+        recipe_ids = sorted(recipes)
+        bitmaps = defaultdict(int)
+        for position, recipe_id in enumerate(recipe_ids):
+            for ingredient_id in recipes[recipe_id]:
+                bitmaps[ingredient_id] |= 1 << position
+        with self.lock:
+            self.recipes = {
+                recipe_id: frozenset(ingredient_ids)
+                for recipe_id, ingredient_ids in recipes.items()
+            }
+            self.bitmaps = dict(bitmaps)
+            self.recipe_ids = recipe_ids
+            self.positions = {
+                recipe_id: position
+                for position, recipe_id in enumerate(recipe_ids)
+            }
+            self.built_at = time.monotonic()
+            self.version = version
+
+    def ensure_built(self):
+        if not self.is_fresh():
+            self.build()
+
+    def _remove(self, recipe_id):
+        position = self.positions.get(recipe_id)
+        if position is None:
+            return
+        mask = ~(1 << position)
+        for ingredient_id in self.recipes.pop(recipe_id, ()):
+            bitmap = self.bitmaps[ingredient_id] & mask
+            if bitmap:
+                self.bitmaps[ingredient_id] = bitmap
+            else:
+                del self.bitmaps[ingredient_id]
+
+    def update_recipe(self, recipe_id):
+        """Перечитываем состав одного рецепта. Вызывается после фиксации
+        транзакции: до нее индекс не должен видеть изменения."""
+        if self.built_at is None:
+            return
+        ingredient_ids = frozenset(
+            RecipeIngredients.objects.filter(recipe_id=recipe_id)
+            .values_list('ingredient_id', flat=True)
+            .order_by()
+        )
+        with self.lock:
+            self._remove(recipe_id)
+            position = self.positions.get(recipe_id)
+            if position is None:
+                position = len(self.recipe_ids)
+                self.recipe_ids.append(recipe_id)
+                self.positions[recipe_id] = position
+            self.recipes[recipe_id] = ingredient_ids
+            for ingredient_id in ingredient_ids:
+                self.bitmaps[ingredient_id] = self.bitmaps.get(
+                    ingredient_id, 0
+                ) | (1 << position)
+
+    def remove_recipe(self, recipe_id):
+        if self.built_at is None:
+            return
+        with self.lock:
+            self._remove(recipe_id)
+            self.positions.pop(recipe_id, None)
+
+    def publish(self):
+        """Сообщаем другим воркерам об изменении состава. Если индекс
+        процесса был актуален, он уже обновлен и остается актуальным."""
+        [current] = versions.get_versions(versions.PANTRY, fresh=True)
+        was_current = self.version == current
+        version = versions.bump(versions.PANTRY)
+        if was_current:
+            self.version = version
+
+    def search(self, ingredient_ids, max_missing=0):
+        """Ищем рецепты, для которых не хватает не больше max_missing
+        ингредиентов. Возвращаем id рецептов: сначала те, где
+        недостающих меньше, при равенстве более новые."""
+        self.ensure_built()
+        pantry = frozenset(ingredient_ids)
+        with self.lock:
+            candidates = 0
+            for ingredient_id in pantry:
+                candidates |= self.bitmaps.get(ingredient_id, 0)
+            found = []
+            for position in iter_bits(candidates):
+                recipe_id = self.recipe_ids[position]
+                missing = len(self.recipes[recipe_id] - pantry)
+                if missing <= max_missing:
+                    found.append((missing, -recipe_id))
+        found.sort()
+        return [-recipe_id for missing, recipe_id in found]
+
+
+pantry_index = PantryIndex()
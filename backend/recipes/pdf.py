@@ -0,0 +1,122 @@
+"""PDF списка покупок, сверстанный в отдельном пуле процессов.
+
+Верстка reportlab нагружает процессор, поэтому выполняется
+в ограниченном пуле процессов (SHOPPING_LIST_PDF['WORKERS']), а не
+в воркере, принимающем запросы. Процессы пула запускаются через spawn
+и не наследуют соединения с базой и потоки воркера: функция render
+получает готовые строки списка и не обращается к Django. Если в пуле
+уже ждут MAX_PENDING задач, новая сразу отклоняется (PoolBusy).
+reportlab импортируется только в процессах пула.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent import futures
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+FONT_NAME = 'ShoppingList'
+MARGIN = 50
+LINE_HEIGHT = 18
+
+executor = None
+executor_lock = threading.Lock()
+pending = None
+
+
+class PoolBusy(Exception):
+    """Все места в очереди пула заняты или пул перезапускается."""
+
+
+def register_font(font_path):
+    """Шрифт с кириллицей; без файла шрифта — встроенный Helvetica."""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    if FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return FONT_NAME
+    if not os.path.exists(font_path):
+        return 'Helvetica'
+    pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
+    return FONT_NAME
+
+
+def render(lines, font_path):
+    """Верстаем список: lines — пары (ингредиент, количество)."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    font = register_font(font_path)
+    height = A4[1]
+    y = height - MARGIN
+    pdf.setFont(font, 16)
+    pdf.drawString(MARGIN, y, 'Список продуктов')
+    y -= LINE_HEIGHT * 2
+    pdf.setFont(font, 12)
+    for ingredient, amount in lines:
+        if y < MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, 12)
+            y = height - MARGIN
+        pdf.drawString(MARGIN, y, f'{ingredient} — {amount}')
+        y -= LINE_HEIGHT
+    pdf.save()
+    return buffer.getvalue()
+
+
+def get_executor():
+    """Пул и семафор мест его очереди. Семафор создается вместе с пулом:
+    задача освобождает место того пула, в который была отправлена."""
+    global executor, pending
+    with executor_lock:
+        if executor is None:
+            config = settings.SHOPPING_LIST_PDF
+            executor = ProcessPoolExecutor(
+                config['WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            pending = threading.BoundedSemaphore(config['MAX_PENDING'])
+        return executor, pending
+
+
+def discard(pool):
+    """Пул с аварийно завершившимся процессом создается заново."""
+    global executor
+    with executor_lock:
+        if executor is pool:
+            executor = None
+    pool.shutdown(wait=False)
+
+
+def render_in_pool(lines):
+    """PDF из пула процессов. PoolBusy, если очередь заполнена,
+    TimeoutError, если верстка не уложилась в TIMEOUT секунд.
+    Пул, процесс которого завершился аварийно, создается заново."""
+    config = settings.SHOPPING_LIST_PDF
+    pool, slots = get_executor()
+    if not slots.acquire(blocking=False):
+        raise PoolBusy
+    try:
+        future = pool.submit(render, list(lines), config['FONT'])
+    except (BrokenProcessPool, RuntimeError):
+        # RuntimeError: пул уже остановлен другим потоком.
+        slots.release()
+        discard(pool)
+        raise PoolBusy
+    # Место освобождается, когда задача действительно завершится:
+    # после таймаута процесс пула еще занят версткой.
+    future.add_done_callback(lambda future: slots.release())
+    try:
+        return future.result(timeout=config['TIMEOUT'])
+    except futures.TimeoutError:
+        # До Python 3.11 это не встроенный TimeoutError.
+        future.cancel()
+        raise TimeoutError
+    except BrokenProcessPool:
+        discard(pool)
+        raise PoolBusy
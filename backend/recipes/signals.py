@@ -0,0 +1,201 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from recipes import cart, similarity, snapshots
+from recipes.models import Ingredient, Recipe, ShoppingCart, Tag
+from recipes.pantry import pantry_index
+from users.models import User
+
+# Состав рецепта (теги и ингредиенты) сохраняется через bulk_create и
+# set(), которые не вызывают post_save, поэтому места записи рецепта
+# (сериализатор и админка) отправляют этот сигнал явно. В old_amounts
+# передается состав рецепта до изменения: {id ингредиента: количество}.
+recipe_composition_changed = Signal()
+
+# Дата изменения рецептов обновлена запросом UPDATE, без post_save.
+# В recipe_ids передаются id затронутых рецептов.
+recipes_touched = Signal()
+
+
+@receiver(recipe_composition_changed)
+def reset_similar_recipes(sender, recipe, created, **kwargs):
+    """Сбрасываем похожие рецепты, если состав рецепта изменился."""
+    if not created:
+        similarity.mark_stale([recipe.pk])
+
+
+@receiver(recipe_composition_changed)
+def update_pantry_index(sender, recipe, **kwargs):
+    """Обновляем рецепт в индексе поиска по продуктам после фиксации."""
+    recipe_id = recipe.pk
+
+    def update():
+        pantry_index.update_recipe(recipe_id)
+        pantry_index.publish()
+
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_pantry_index(sender, instance, **kwargs):
+    """Удаляем рецепт из индекса поиска по продуктам после фиксации."""
+    recipe_id = instance.pk
+
+    def remove():
+        pantry_index.remove_recipe(recipe_id)
+        pantry_index.publish()
+
+    transaction.on_commit(remove)
+
+
+@receiver(recipe_composition_changed)
+def update_shopping_cart_totals(
+    sender, recipe, created, old_amounts=None, **kwargs
+):
+    """Переносим изменение состава рецепта в итоги корзин."""
+    if not created:
+        cart.recipe_changed(recipe.pk, old_amounts or {})
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_from_shopping_cart_totals(sender, instance, **kwargs):
+    """Вычитаем удаляемый рецепт из итогов корзин."""
+    user_ids = ShoppingCart.objects.filter(recipe=instance).values_list(
+        'user_id', flat=True
+    )
+    cart.apply_delta(user_ids, cart.recipe_amounts(instance.pk), {})
+
+
+def touch_recipes(recipe_ids):
+    """Обновляем дату изменения рецептов."""
+    recipe_ids = list(recipe_ids)
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        updated_at=timezone.now()
+    )
+    recipes_touched.send(sender=Recipe, recipe_ids=recipe_ids)
+
+
+def refresh_recipes(recipe_ids):
+    """Обновляем дату изменения и снимок связанных данных рецептов."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        touch_recipes(recipe_ids)
+        snapshots.rebuild(recipe_ids)
+
+
+def refresh_recipes_later(recipe_ids):
+    """Как refresh_recipes, но снимки сбрасываются и пересобираются
+    фоновой задачей: изменение тега, ингредиента или автора может
+    затронуть очень много рецептов."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        touch_recipes(recipe_ids)
+        snapshots.schedule_rebuild(recipe_ids)
+
+
+def related_recipe_ids(**lookups):
+    return list(
+        Recipe.objects.filter(**lookups)
+        .values_list('id', flat=True)
+        .order_by()
+        .distinct()
+    )
+
+
+@receiver(recipe_composition_changed)
+def refresh_recipe_composition(sender, recipe, **kwargs):
+    """Состав рецепта сохраняется после самого рецепта."""
+    refresh_recipes([recipe.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def refresh_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    """Теги рецепта изменены через add/remove/clear. Со стороны рецепта
+    снимок пересоберет recipe_composition_changed, который отправляет
+    место записи, со стороны тега пересобираем сразу."""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_recipes([instance.pk])
+    elif action == 'pre_clear':
+        instance._cleared_recipe_ids = related_recipe_ids(tags=instance)
+    elif action == 'post_clear':
+        refresh_recipes_later(getattr(instance, '_cleared_recipe_ids', ()))
+    elif action in ('post_add', 'post_remove'):
+        refresh_recipes_later(pk_set)
+
+
+def remember_related_recipes(instance, **lookups):
+    """Перед удалением запоминаем рецепты, снимки которых устареют."""
+    instance._related_recipe_ids = related_recipe_ids(**lookups)
+
+
+@receiver(post_save, sender=Tag)
+def refresh_tag_recipes(sender, instance, **kwargs):
+    """Тег выводится в рецептах целиком."""
+    refresh_recipes_later(related_recipe_ids(tags=instance))
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tag_recipes(sender, instance, **kwargs):
+    remember_related_recipes(instance, tags=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_recipes(sender, instance, **kwargs):
+    """Название и единица измерения ингредиента выводятся в рецептах."""
+    refresh_recipes_later(related_recipe_ids(ingredients=instance))
+
+
+@receiver(pre_delete, sender=Ingredient)
+def remember_ingredient_recipes(sender, instance, **kwargs):
+    remember_related_recipes(instance, ingredients=instance)
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_related_recipes(sender, instance, **kwargs):
+    refresh_recipes_later(getattr(instance, '_related_recipe_ids', ()))
+
+
+# Поля пользователя, которые выводятся в рецептах как данные автора.
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_author_changes(sender, instance, update_fields=None, **kwargs):
+    """Запоминаем в instance._author_changed, изменились ли данные
+    автора, у которого есть рецепты (вход, пароль и прочие поля
+    на рецепты не влияют)."""
+    fields = [
+        field
+        for field in AUTHOR_FIELDS
+        if update_fields is None or field in update_fields
+    ]
+    instance._author_changed = False
+    if instance._state.adding or not fields:
+        return
+    old = User.objects.filter(pk=instance.pk).values_list(*fields).first()
+    instance._author_changed = (
+        old is not None
+        and old != tuple(getattr(instance, field) for field in fields)
+        and Recipe.objects.filter(author=instance).exists()
+    )
+
+
+def author_changed(instance):
+    return getattr(instance, '_author_changed', False)
+
+
+@receiver(post_save, sender=User)
+def refresh_author_recipes(sender, instance, **kwargs):
+    """Данные автора выводятся в рецептах."""
+    if author_changed(instance):
+        refresh_recipes_later(related_recipe_ids(author=instance))
@@ -0,0 +1,199 @@
+"""Офлайн-расчет похожих рецептов по пересечению ингредиентов и тегов.
+
+Рецепты представляются разреженными векторами-множествами ингредиентов
+и тегов. Строка произведения матриц «рецепт x ингредиент» на
+транспонированную считается через инвертированный индекс
+«ингредиент -> рецепты», поэтому сравниваются только рецепты,
+у которых есть хотя бы один общий ингредиент.
+"""
+import heapq
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.models import Recipe, RecipeIngredients, SimilarRecipe
+
+
+def jaccard(intersection, left_size, right_size):
+    """Коэффициент Жаккара по размеру пересечения и размерам множеств."""
+    union = left_size + right_size - intersection
+    return intersection / union if union else 0.0
+
+
+class SimilarityIndex:
+    """Разреженное представление каталога для расчета сходства."""
+
+    def __init__(self):
+        self.ingredients = defaultdict(set)
+        self.tags = defaultdict(set)
+        self.postings = defaultdict(list)
+        self.skipped = set()
+
+    @classmethod
+    def load(cls):
+        """Загружаем векторы рецептов двумя запросами."""
+        index = cls()
+        rows = RecipeIngredients.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).order_by()
+        for recipe_id, ingredient_id in rows.iterator():
+            index.ingredients[recipe_id].add(ingredient_id)
+            index.postings[ingredient_id].append(recipe_id)
+        tag_rows = Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id'
+        ).order_by()
+        for recipe_id, tag_id in tag_rows.iterator():
+            index.tags[recipe_id].add(tag_id)
+        index.skip_frequent_ingredients()
+        return index
+
+    def skip_frequent_ingredients(self):
+        """Исключаем из генерации кандидатов слишком частые ингредиенты
+        (соль, вода), иначе каждый рецепт сравнивается со всем каталогом.
+        При подсчете сходства они по-прежнему учитываются."""
+        limit = max(
+            settings.SIMILAR_RECIPES_MAX_DF * len(self.ingredients),
+            settings.SIMILAR_RECIPES_MIN_DF_LIMIT,
+        )
+        self.skipped = {
+            ingredient_id
+            for ingredient_id, recipes in self.postings.items()
+            if len(recipes) > limit
+        }
+
+    def neighbors(self, recipe_id):
+        """Считаем сходство рецепта со всеми кандидатами."""
+        own_ingredients = self.ingredients.get(recipe_id, set())
+        own_tags = self.tags.get(recipe_id, set())
+        intersections = defaultdict(int)
+        for ingredient_id in own_ingredients - self.skipped:
+            for other_id in self.postings[ingredient_id]:
+                intersections[other_id] += 1
+        intersections.pop(recipe_id, None)
+
+        tag_weight = settings.SIMILAR_RECIPES_TAG_WEIGHT
+        scores = {}
+        for other_id in intersections:
+            other_ingredients = self.ingredients[other_id]
+            other_tags = self.tags.get(other_id, set())
+            ingredient_score = jaccard(
+                len(own_ingredients & other_ingredients),
+                len(own_ingredients),
+                len(other_ingredients),
+            )
+            tag_score = jaccard(
+                len(own_tags & other_tags), len(own_tags), len(other_tags)
+            )
+            scores[other_id] = (
+                1 - tag_weight
+            ) * ingredient_score + tag_weight * tag_score
+        return scores
+
+    def top_neighbors(self, recipe_id, limit):
+        """Возвращаем limit наиболее похожих рецептов."""
+        scores = self.neighbors(recipe_id)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+def chunked(iterable, size):
+    """Доп.функция: разбиваем последовательность на порции."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def rebuild_similar_recipes(index, recipe_ids, limit, chunk_size):
+    """Полностью пересчитываем соседей для переданных рецептов.
+    Каждая порция записывается в своей транзакции, рецепты порции
+    отмечаются рассчитанными, даже если соседей у них нет."""
+    processed = 0
+    for chunk in chunked(recipe_ids, chunk_size):
+        rows = [
+            SimilarRecipe(
+                recipe_id=recipe_id, similar_id=other_id, score=score
+            )
+            for recipe_id in chunk
+            for other_id, score in index.top_neighbors(recipe_id, limit)
+        ]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=chunk).delete()
+            SimilarRecipe.objects.bulk_create(rows)
+            Recipe.objects.filter(id__in=chunk).update(
+                similar_computed_at=timezone.now()
+            )
+        processed += len(chunk)
+    return processed
+
+
+def merge_into_neighbors(index, recipe_ids, limit):
+    """Добавляем обновленные рецепты в топ соседей уже посчитанных рецептов.
+
+    Сходство симметрично, поэтому строка нового рецепта дает и его вклад
+    в чужие списки: рецепт попадает в список соседа, если его оценка выше
+    худшей из сохраненных или список еще не заполнен.
+    """
+    candidates = defaultdict(dict)
+    for recipe_id in recipe_ids:
+        for other_id, score in index.neighbors(recipe_id).items():
+            candidates[other_id][recipe_id] = score
+    candidates = {
+        other_id: scores
+        for other_id, scores in candidates.items()
+        if other_id not in recipe_ids
+    }
+    chunk_size = settings.SIMILAR_RECIPES_CHUNK_SIZE
+    for chunk in chunked(list(candidates), chunk_size):
+        stored = defaultdict(dict)
+        for recipe_id, similar_id, score in SimilarRecipe.objects.filter(
+            recipe_id__in=chunk
+        ).values_list('recipe_id', 'similar_id', 'score'):
+            stored[recipe_id][similar_id] = score
+        rows = []
+        for other_id in chunk:
+            merged = {**stored[other_id], **candidates[other_id]}
+            for similar_id, score in heapq.nlargest(
+                limit, merged.items(), key=lambda item: item[1]
+            ):
+                rows.append(
+                    SimilarRecipe(
+                        recipe_id=other_id, similar_id=similar_id, score=score
+                    )
+                )
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=chunk).delete()
+            SimilarRecipe.objects.bulk_create(rows)
+
+
+def mark_stale(recipe_ids):
+    """Сбрасываем рассчитанных соседей измененных рецептов. Рецепты,
+    в списках которых они были, тоже отмечаются устаревшими:
+    при следующем инкрементальном запуске их списки пересчитываются
+    и дополняются до полного."""
+    recipe_ids = list(recipe_ids)
+    neighbor_ids = set(
+        SimilarRecipe.objects.filter(similar_id__in=recipe_ids).values_list(
+            'recipe_id', flat=True
+        )
+    )
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(recipe_id__in=recipe_ids).delete()
+        SimilarRecipe.objects.filter(similar_id__in=recipe_ids).delete()
+        Recipe.objects.filter(id__in=neighbor_ids | set(recipe_ids)).update(
+            similar_computed_at=None
+        )
+
+
+def stale_recipe_ids():
+    """Рецепты, соседи которых не рассчитаны: новые и измененные."""
+    return list(
+        Recipe.objects.filter(similar_computed_at__isnull=True)
+        .values_list('id', flat=True)
+        .order_by('id')
+    )
@@ -0,0 +1,153 @@
+"""Денормализованный снимок связанных данных рецепта.
+
+В Recipe.snapshot хранятся уже подготовленные к выдаче теги, состав
+(название, единица измерения, количество) и автор рецепта, чтобы
+лента и карточка читали одну таблицу. Снимок пересобирается сигналами
+при изменении состава рецепта. Изменение тега, ингредиента или автора
+затрагивает много рецептов: их снимки сбрасываются одним UPDATE (пустой
+снимок чтение строит на лету), а пересобирает их фоновая задача
+recipes.rebuild_snapshots. Расхождения исправляет команда
+rebuild_recipe_snapshots.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from jobs.queue import enqueue
+from recipes.models import Recipe, RecipeIngredients
+from users.models import User
+
+TAG_KEYS = ('id', 'name', 'color', 'slug')
+INGREDIENT_KEYS = ('id', 'name', 'measurement_unit', 'amount')
+AUTHOR_KEYS = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+def recipe_tags(recipe_ids):
+    """Теги рецептов: {id рецепта: [тег, ...]}, каждый тег создается
+    один раз на вызов."""
+    tags = {}
+    result = defaultdict(list)
+    rows = (
+        Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids)
+        .values_list(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+        )
+        .order_by('tag__name')
+    )
+    for recipe_id, tag_id, name, color, slug in rows:
+        if tag_id not in tags:
+            tags[tag_id] = dict(zip(TAG_KEYS, (tag_id, name, color, slug)))
+        result[recipe_id].append(tags[tag_id])
+    return result
+
+
+def recipe_ingredients(recipe_ids):
+    """Состав рецептов: {id рецепта: [ингредиент, ...]}."""
+    result = defaultdict(list)
+    rows = (
+        RecipeIngredients.objects.filter(recipe_id__in=recipe_ids)
+        .values_list(
+            'recipe_id',
+            'ingredient_id',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'amount',
+        )
+        .order_by('-id')
+    )
+    for recipe_id, *values in rows:
+        result[recipe_id].append(dict(zip(INGREDIENT_KEYS, values)))
+    return result
+
+
+def build(rows):
+    """Снимки рецептов: {id рецепта: снимок}.
+    rows: строки с полями id и author_id."""
+    rows = list(rows)
+    recipe_ids = [row['id'] for row in rows]
+    tags = recipe_tags(recipe_ids)
+    ingredients = recipe_ingredients(recipe_ids)
+    authors = {
+        author['id']: author
+        for author in User.objects.filter(
+            id__in={row['author_id'] for row in rows}
+        ).values(*AUTHOR_KEYS)
+    }
+    return {
+        row['id']: {
+            'tags': tags[row['id']],
+            'ingredients': ingredients[row['id']],
+            'author': authors[row['author_id']],
+        }
+        for row in rows
+    }
+
+
+def restore_order(snapshot):
+    """Ключи снимка в порядке выдачи API: jsonb в PostgreSQL хранит
+    ключи объектов в собственном порядке."""
+    return {
+        'tags': [
+            {key: tag[key] for key in TAG_KEYS} for tag in snapshot['tags']
+        ],
+        'ingredients': [
+            {key: ingredient[key] for key in INGREDIENT_KEYS}
+            for ingredient in snapshot['ingredients']
+        ],
+        'author': {key: snapshot['author'][key] for key in AUTHOR_KEYS},
+    }
+
+
+def rebuild(recipe_ids):
+    """Пересобираем и сохраняем снимки рецептов порциями.
+    Возвращаем число обновленных рецептов."""
+    recipe_ids = list(recipe_ids)
+    chunk_size = settings.RECIPE_SNAPSHOT_CHUNK_SIZE
+    updated = 0
+    for start in range(0, len(recipe_ids), chunk_size):
+        # Строки рецептов блокируются до записи: сброс снимка, начатый
+        # во время сборки, применится после нее, а не потеряется.
+        with transaction.atomic():
+            rows = (
+                Recipe.objects.select_for_update()
+                .filter(id__in=recipe_ids[start:start + chunk_size])
+                .values('id', 'author_id')
+            )
+            snapshots = build(rows)
+            Recipe.objects.bulk_update(
+                [
+                    Recipe(id=recipe_id, snapshot=snapshot)
+                    for recipe_id, snapshot in snapshots.items()
+                ],
+                ['snapshot'],
+            )
+        updated += len(snapshots)
+    return updated
+
+
+def rebuild_missing():
+    """Пересобираем пустые снимки порциями, пока они есть (в том числе
+    сброшенные во время пересборки). Возвращаем число обновленных."""
+    chunk_size = settings.RECIPE_SNAPSHOT_CHUNK_SIZE
+    updated = 0
+    while True:
+        recipe_ids = list(
+            Recipe.objects.filter(snapshot={})
+            .order_by('id')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not recipe_ids:
+            return updated
+        updated += rebuild(recipe_ids)
+
+
+def schedule_rebuild(recipe_ids):
+    """Сбрасываем снимки рецептов и после фиксации ставим в очередь
+    их пересборку (одна задача на все сброшенные снимки)."""
+    Recipe.objects.filter(id__in=recipe_ids).update(snapshot={})
+    transaction.on_commit(
+        lambda: enqueue(
+            'recipes.rebuild_snapshots', unique_key='rebuild-snapshots'
+        )
+    )
@@ -0,0 +1,47 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, именующее файлы по хешу содержимого.
+
+    Одинаковые файлы получают одно имя, поэтому повторная загрузка той же
+    картинки не пишет новый файл, а ссылки на файлы никогда не меняют
+    содержимое и могут кешироваться бессрочно. Файлы, на которые больше
+    не ссылается ни один рецепт, удаляет команда sweep_recipe_images."""
+
+    def content_name(self, name, content):
+        """Имя вида <каталог>/<2 символа хеша>/<sha256>.<расширение>."""
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        hexdigest = digest.hexdigest()
+        return os.path.join(
+            directory, hexdigest[:2], f'{hexdigest}{extension}'
+        ).replace('\\', '/')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # Повторная загрузка продлевает жизнь файла: иначе
+            # sweep_recipe_images может удалить старый файл по дате
+            # изменения до того, как сохранится ссылающийся рецепт.
+            try:
+                os.utime(self.path(name))
+            except FileNotFoundError:
+                return super().save(name, content, max_length)
+            return name
+        return super().save(name, content, max_length)
@@ -0,0 +1,34 @@
+"""Соответствие слагов тегов их id в двухуровневом кеше.
+
+Тегов единицы и меняются они редко, поэтому фильтры по слагам
+разрешают их в id без обращения к базе. Ключ зависит от версии
+пространства tags, которую сигналы меняют при изменении или удалении
+тега.
+"""
+from caching import versions
+from caching.helpers import get_or_compute
+from recipes.models import Tag
+
+
+def load():
+    return dict(Tag.objects.values_list('slug', 'id'))
+
+
+class TagSlugMap:
+    """Словарь {слаг: id} для всех тегов."""
+
+    def get(self):
+        return get_or_compute(
+            versions.versioned_key('tag-slugs', versions.TAGS), load
+        )
+
+    def ids(self, slugs):
+        """Переводим слаги в id, неизвестные слаги пропускаем."""
+        mapping = self.get()
+        return [mapping[slug] for slug in slugs if slug in mapping]
+
+    def choices(self):
+        return [(slug, slug) for slug in self.get()]
+
+
+tag_slugs = TagSlugMap()
@@ -0,0 +1,68 @@
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from jobs.queue import task
+from recipes import cart, deletion, snapshots
+from recipes.models import Recipe
+
+
+def rendition_name(image_name, size_name):
+    """Имя уменьшенной копии изображения рецепта."""
+    basename = os.path.splitext(os.path.basename(image_name))[0]
+    return f'renditions/{size_name}/{basename}.jpg'
+
+
+@task('recipes.image_renditions')
+def make_image_renditions(recipe_id):
+    """Готовим уменьшенные копии изображения рецепта."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return None
+    created = []
+    for size_name, size in settings.RECIPE_IMAGE_RENDITIONS.items():
+        name = rendition_name(recipe.image.name, size_name)
+        if default_storage.exists(name):
+            continue
+        with recipe.image.open('rb') as file:
+            image = Image.open(file)
+            image.thumbnail(size)
+            buffer = io.BytesIO()
+            image.convert('RGB').save(buffer, 'JPEG', quality=85)
+        created.append(
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+        )
+    return {'renditions': created}
+
+
+@task('recipes.shopping_list_export')
+def export_shopping_list(user_id):
+    """Выгружаем список покупок пользователя в файл.
+    Предыдущие выгрузки пользователя удаляются."""
+    fingerprint = cart.cart_fingerprint(cart.cart_rows(user_id))
+    name = cart.export_name(user_id, fingerprint)
+    cart.prune_exports(name)
+    storage = cart.export_storage()
+    if not storage.exists(name):
+        content = ''.join(
+            cart.create_ingredient_list(cart.shopping_list_rows(user_id))
+        )
+        storage.save(name, ContentFile(content.encode()))
+    return {'file': name}
+
+
+@task('recipes.rebuild_snapshots')
+def rebuild_snapshots():
+    """Пересобираем снимки, сброшенные при изменении тегов,
+    ингредиентов и авторов."""
+    return {'updated': snapshots.rebuild_missing()}
+
+
+@task('recipes.delete_recipe')
+def delete_recipe(recipe_id):
+    """Удаляем рецепт с многочисленными зависимыми строками порциями."""
+    return {'deleted': deletion.delete_recipe(recipe_id)}
@@ -0,0 +1,116 @@
+"""Инкрементальный расчет популярности рецептов с экспоненциальным
+затуханием по добавлениям в избранное и в корзину.
+
+Вес события в момент t равен exp(-λ(t - t_события)). Вместо
+пересчета всех рецептов при каждом запуске в RecipeTrend.score
+хранится сумма exp(λ(t_события - t0)) относительно начала отсчета t0:
+текущая популярность равна score * exp(-λ(t - t0)), множитель общий
+для всех рецептов, и порядок по score совпадает с порядком по
+популярности. Когда показатели растут слишком сильно, начало отсчета
+сдвигается и все значения масштабируются одним UPDATE.
+
+Контрольная точка отстает от текущего времени на SETTLE_SECONDS:
+created_at назначается при вставке, а транзакция фиксируется позже, и
+без задержки событие с датой до контрольной точки, зафиксированное
+после нее, не попало бы в расчет.
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from recipes.models import Checkpoint, Favorite, RecipeTrend, ShoppingCart
+
+CHECKPOINT_KEY = 'trending'
+EPOCH_KEY = 'trending_epoch'
+MAX_EXPONENT = 500
+SOURCES = (('favorite', Favorite), ('shopping_cart', ShoppingCart))
+
+
+def decay_rate():
+    """λ в 1/сек по периоду полураспада из настроек."""
+    return math.log(2) / (settings.TRENDING['HALF_LIFE_HOURS'] * 3600)
+
+
+def get_checkpoint(key, default):
+    checkpoint = Checkpoint.objects.filter(key=key).first()
+    return checkpoint.value if checkpoint else default
+
+
+def set_checkpoint(key, value):
+    Checkpoint.objects.update_or_create(key=key, defaults={'value': value})
+
+
+def rebase(epoch, now):
+    """Сдвигаем начало отсчета к now, если показатели близки к
+    переполнению."""
+    rate = decay_rate()
+    if rate * (now - epoch).total_seconds() < MAX_EXPONENT:
+        return epoch
+    factor = math.exp(-rate * (now - epoch).total_seconds())
+    RecipeTrend.objects.update(score=F('score') * factor)
+    set_checkpoint(EPOCH_KEY, now)
+    return now
+
+
+def collect_increments(since, until, epoch):
+    """Сумма весов новых событий по рецептам."""
+    rate = decay_rate()
+    weights = settings.TRENDING['WEIGHTS']
+    increments = defaultdict(float)
+    for source, model in SOURCES:
+        events = model.objects.filter(
+            created_at__gt=since, created_at__lte=until
+        ).values_list('recipe_id', 'created_at')
+        for recipe_id, created_at in events.order_by().iterator():
+            increments[recipe_id] += weights[source] * math.exp(
+                rate * (created_at - epoch).total_seconds()
+            )
+    return increments
+
+
+def apply_increments(increments, chunk_size):
+    recipe_ids = list(increments)
+    for start in range(0, len(recipe_ids), chunk_size):
+        chunk = recipe_ids[start:start + chunk_size]
+        with transaction.atomic():
+            RecipeTrend.objects.bulk_create(
+                [RecipeTrend(recipe_id=recipe_id) for recipe_id in chunk],
+                ignore_conflicts=True,
+            )
+            RecipeTrend.objects.filter(recipe_id__in=chunk).update(
+                score=Case(
+                    *(
+                        When(
+                            recipe_id=recipe_id,
+                            then=F('score') + increments[recipe_id],
+                        )
+                        for recipe_id in chunk
+                    ),
+                    default=F('score'),
+                )
+            )
+
+
+def update_trending(chunk_size=500):
+    """Учитываем события с прошлой контрольной точки.
+    Возвращаем количество затронутых рецептов."""
+    now = timezone.now()
+    window = timedelta(hours=settings.TRENDING['INITIAL_WINDOW_HOURS'])
+    since = get_checkpoint(CHECKPOINT_KEY, now - window)
+    epoch = get_checkpoint(EPOCH_KEY, None)
+    if epoch is None:
+        epoch = now
+        set_checkpoint(EPOCH_KEY, epoch)
+    epoch = rebase(epoch, now)
+    until = now - timedelta(seconds=settings.TRENDING['SETTLE_SECONDS'])
+    if until <= since:
+        return 0
+    increments = collect_increments(since, until, epoch)
+    apply_increments(increments, chunk_size)
+    set_checkpoint(CHECKPOINT_KEY, until)
+    return len(increments)
@@ -0,0 +1,142 @@
+"""Журнал изменений и курсоры инкрементальной синхронизации.
+
+Каждое изменение рецепта, избранного, корзины и подписок пишется
+в журнал Change. id выделяются при вставке, а транзакции фиксируются
+в другом порядке (изменение тега в админке пишет тысячи записей в одной
+долгой транзакции), поэтому порядок выдачи — не id, а позиция
+(txid, id), где txid — номер транзакции PostgreSQL, записавшей строку.
+Выдаются только строки транзакций младше xmin текущего снимка: все они
+завершены, а любая еще не видимая запись получит позицию дальше уже
+выданных. В SQLite записи сериализованы блокировкой базы, txid у всех
+строк 0, и порядок выдачи совпадает с id.
+
+Курсор — подписанная позиция последней выданной записи. Журнал
+хранится RETENTION_DAYS дней; курсор старше журнала считается
+устаревшим, и клиенту нужна полная синхронизация.
+
+Порядок работы клиента: получить курсор без параметров, загрузить
+полные списки, затем запрашивать изменения с курсором.
+"""
+from datetime import timedelta
+
+from django.core import signing
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from sync.models import Change
+
+CURSOR_SALT = 'sync.cursor'
+
+
+class CursorExpired(Exception):
+    """Часть изменений после курсора уже удалена из журнала."""
+
+
+def uses_txid():
+    return connection.vendor == 'postgresql'
+
+
+def record(kind, action, object_ids, user_id=None):
+    txid = RawSQL('txid_current()', ()) if uses_txid() else 0
+    Change.objects.bulk_create(
+        Change(
+            kind=kind,
+            action=action,
+            object_id=object_id,
+            user_id=user_id,
+            txid=txid,
+        )
+        for object_id in object_ids
+    )
+
+
+def encode_cursor(position):
+    return signing.dumps(list(position), salt=CURSOR_SALT)
+
+
+def decode_cursor(cursor):
+    """Позиция (txid, id) из курсора; ValueError для чужого курсора.
+    Курсоры с одним id выданы до появления txid: строки того времени
+    записаны с txid 0."""
+    try:
+        position = signing.loads(cursor, salt=CURSOR_SALT)
+        if isinstance(position, int):
+            return 0, position
+        txid, change_id = position
+        return int(txid), int(change_id)
+    except (signing.BadSignature, TypeError, ValueError):
+        raise ValueError('Некорректный курсор.')
+
+
+def settled():
+    """Записи, чьи транзакции гарантированно завершены."""
+    if not uses_txid():
+        return Change.objects.all()
+    return Change.objects.filter(
+        txid__lt=RawSQL('txid_snapshot_xmin(txid_current_snapshot())', ())
+    )
+
+
+def current_position():
+    """Позиция последней завершенной записи журнала."""
+    return (
+        settled().order_by('-txid', '-id').values_list('txid', 'id').first()
+        or (0, 0)
+    )
+
+
+def changes_since(user, position, limit):
+    """Изменения для пользователя после позиции: общие изменения
+    рецептов и его собственные. Возвращаем (строки, позиция последней
+    строки, есть ли еще изменения)."""
+    txid, change_id = position
+    oldest = Change.objects.order_by('id').values_list('id', flat=True)
+    oldest = oldest.first()
+    if oldest is not None and change_id < oldest - 1:
+        raise CursorExpired
+    rows = list(
+        settled()
+        .filter(Q(user__isnull=True) | Q(user=user))
+        .filter(Q(txid__gt=txid) | Q(txid=txid, id__gt=change_id))
+        .order_by('txid', 'id')
+        .values_list('txid', 'id', 'kind', 'action', 'object_id')[
+            : limit + 1
+        ]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        position = rows[-1][:2]
+    return [row[1:] for row in rows], position, has_more
+
+
+def collapse(rows):
+    """Итоговое действие по каждому объекту: {(вид, id): действие}.
+    Создание с последующим изменением остается созданием."""
+    result = {}
+    for _, kind, action, object_id in rows:
+        key = (kind, object_id)
+        if not (
+            action == Change.Action.UPDATE
+            and result.get(key) == Change.Action.CREATE
+        ):
+            result[key] = action
+    return result
+
+
+def prune(days):
+    """Удаляем записи старше days дней, кроме последней: по ней
+    проверяется, не устарел ли курсор."""
+    last_id = Change.objects.order_by('-id').values_list('id', flat=True)
+    last_id = last_id.first()
+    if last_id is None:
+        return 0
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = (
+        Change.objects.filter(created_at__lt=cutoff)
+        .exclude(id=last_id)
+        .delete()
+    )
+    return deleted
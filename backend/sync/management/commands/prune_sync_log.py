@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from sync.changes import prune
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет старые записи журнала изменений. Клиентам с курсором '
+        'старше журнала потребуется полная синхронизация.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.SYNC['RETENTION_DAYS'],
+            help='Сколько дней хранить записи.',
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено записей: {deleted}.'))
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.3 on 2026-10-19 11:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sync', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='change',
+            name='change_user_id_idx',
+        ),
+        migrations.AddField(
+            model_name='change',
+            name='txid',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Транзакция'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['txid', 'id'], name='change_txid_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user', 'txid', 'id'], name='change_user_txid_id_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.db.models import (
+    CASCADE,
+    CharField,
+    DateTimeField,
+    ForeignKey,
+    Index,
+    Model,
+    PositiveBigIntegerField,
+    TextChoices,
+)
+
+
+class Change(Model):
+    """Модель записи журнала изменений для инкрементальной синхронизации.
+    Изменения рецептов общие (user пустой), изменения избранного,
+    корзины и подписок относятся к пользователю."""
+
+    class Kind(TextChoices):
+        RECIPE = 'recipe', 'Рецепт'
+        FAVORITE = 'favorite', 'Избранное'
+        SHOPPING_CART = 'shopping_cart', 'Корзина'
+        SUBSCRIPTION = 'subscription', 'Подписка'
+
+    class Action(TextChoices):
+        CREATE = 'create', 'Создание'
+        UPDATE = 'update', 'Изменение'
+        DELETE = 'delete', 'Удаление'
+
+    kind = CharField(
+        verbose_name='Объект', max_length=16, choices=Kind.choices
+    )
+    action = CharField(
+        verbose_name='Действие', max_length=8, choices=Action.choices
+    )
+    object_id = PositiveBigIntegerField(verbose_name='id объекта')
+    user = ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name='Пользователь',
+        on_delete=CASCADE,
+        null=True,
+        related_name='+',
+    )
+    created_at = DateTimeField(
+        verbose_name='Дата изменения', auto_now_add=True, db_index=True
+    )
+    # Номер записавшей транзакции PostgreSQL (sync.changes), иначе 0.
+    txid = PositiveBigIntegerField(verbose_name='Транзакция', default=0)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            Index(fields=['txid', 'id'], name='change_txid_id_idx'),
+            Index(
+                fields=['user', 'txid', 'id'], name='change_user_txid_id_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}: {self.action}'
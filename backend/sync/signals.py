@@ -0,0 +1,62 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.signals import recipes_touched
+from sync.changes import record
+from sync.models import Change
+from users.models import Subscription
+
+
+@receiver(post_save, sender=Recipe)
+def log_recipe_save(sender, instance, created, **kwargs):
+    record(
+        Change.Kind.RECIPE,
+        Change.Action.CREATE if created else Change.Action.UPDATE,
+        [instance.pk],
+    )
+
+
+@receiver(recipes_touched)
+def log_recipes_touched(sender, recipe_ids, **kwargs):
+    """Изменились теги, состав, ингредиенты или автор рецептов."""
+    record(Change.Kind.RECIPE, Change.Action.UPDATE, recipe_ids)
+
+
+@receiver(post_delete, sender=Recipe)
+def log_recipe_delete(sender, instance, **kwargs):
+    record(Change.Kind.RECIPE, Change.Action.DELETE, [instance.pk])
+
+
+USER_CHANGES = {
+    Favorite: (Change.Kind.FAVORITE, 'recipe_id'),
+    ShoppingCart: (Change.Kind.SHOPPING_CART, 'recipe_id'),
+    Subscription: (Change.Kind.SUBSCRIPTION, 'author_id'),
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+def log_user_change_save(sender, instance, created, **kwargs):
+    if created:
+        kind, field = USER_CHANGES[sender]
+        record(
+            kind,
+            Change.Action.CREATE,
+            [getattr(instance, field)],
+            instance.user_id,
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def log_user_change_delete(sender, instance, **kwargs):
+    kind, field = USER_CHANGES[sender]
+    record(
+        kind,
+        Change.Action.DELETE,
+        [getattr(instance, field)],
+        instance.user_id,
+    )
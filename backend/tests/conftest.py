@@ -0,0 +1,116 @@
+import base64
+import io
+
+import pytest
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from django.core.cache import caches
+
+from caching import versions
+from recipes.models import Ingredient, Tag
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def clean_cache(settings, tmp_path):
+    """Кеш и версии пространств не переживают тест: id объектов
+    в тестовой базе повторяются."""
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.SHOPPING_LIST_EXPORTS_ROOT = str(tmp_path / 'exports')
+    caches['default'].clear()
+    versions.local_versions.clear()
+    yield
+    caches['default'].clear()
+    versions.local_versions.clear()
+
+
+def png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (10, 10), 'red').save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+@pytest.fixture
+def api_client(transactional_db):
+    """Клиент API, авторизованный токеном пользователя."""
+
+    def create(user=None):
+        client = APIClient()
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    return create
+
+
+@pytest.fixture
+def users(transactional_db):
+    return [
+        User.objects.create_user(
+            username=f'user{number}',
+            email=f'user{number}@example.com',
+            password='pass12345!',
+            first_name='Имя',
+            last_name='Фамилия',
+        )
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def tags(transactional_db):
+    return [
+        Tag.objects.create(
+            name=f'Тег {number}', color=f'#00000{number}', slug=f'tag{number}'
+        )
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients(transactional_db):
+    return [
+        Ingredient.objects.create(
+            name=f'ингредиент {number}', measurement_unit='г'
+        )
+        for number in range(8)
+    ]
+
+
+@pytest.fixture
+def create_recipe(api_client, tags, ingredients):
+    """Создаем рецепт через API, как это делает клиент."""
+
+    def create(author, name, ingredient_numbers, tag_numbers):
+        response = api_client(author).post(
+            '/api/recipes/',
+            {
+                'name': name,
+                'text': f'Описание «{name}»',
+                'cooking_time': 5,
+                'image': png(),
+                'tags': [tags[number].id for number in tag_numbers],
+                'ingredients': [
+                    {'id': ingredients[number].id, 'amount': 10 + number}
+                    for number in ingredient_numbers
+                ],
+            },
+            format='json',
+        )
+        assert response.status_code == 201, response.content
+        return response.json()
+
+    return create
+
+
+@pytest.fixture
+def recipes(users, create_recipe):
+    return [
+        create_recipe(users[0], 'Первый', [0, 1, 2], [0]),
+        create_recipe(users[0], 'Второй', [0, 1, 3], [0, 1]),
+        create_recipe(users[1], 'Третий', [4, 5], [2]),
+    ]
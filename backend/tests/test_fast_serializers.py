@@ -0,0 +1,148 @@
+"""Контракт быстрого пути чтения: байт в байт тот же ответ, что и
+у RecipeSerializer/SubscriptionSerializer с JSONRenderer, в том числе
+с параметрами fields и omit."""
+import pytest
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from django.contrib.auth.models import AnonymousUser
+
+from api import fieldsets
+from api.serializers import RecipeSerializer, SubscriptionSerializer
+from api.views import CustomPageNumberPagination
+from recipes.models import Recipe
+from users.models import User
+
+factory = APIRequestFactory()
+
+
+def drf_request(path, user):
+    request = factory.get(path)
+    force_authenticate(request, user)
+    request = Request(request)
+    request.user = user or AnonymousUser()
+    return request
+
+
+def select(payload, fields):
+    if fields is None:
+        return payload
+    return {key: value for key, value in payload.items() if key in fields}
+
+
+def selected(query):
+    if not query:
+        return None
+    request = drf_request(f'/?{query}', None)
+    return fieldsets.requested_fields(request.query_params, fieldsets.RECIPE)
+
+
+def reference_recipe_list(query, user):
+    request = drf_request(f'http://testserver/api/recipes/?{query}', user)
+    paginator = CustomPageNumberPagination()
+    page = paginator.paginate_queryset(
+        Recipe.objects.prefetch_related('author', 'tags', 'ingredients'),
+        request,
+    )
+    fields = selected(query.replace('page_size=10', ''))
+    data = [
+        select(payload, fields)
+        for payload in RecipeSerializer(
+            page, many=True, context={'request': request}
+        ).data
+    ]
+    return JSONRenderer().render(paginator.get_paginated_response(data).data)
+
+
+def reference_recipe(recipe_id, query, user):
+    request = drf_request('/', user)
+    payload = RecipeSerializer(
+        Recipe.objects.get(id=recipe_id), context={'request': request}
+    ).data
+    return JSONRenderer().render(select(payload, selected(query)))
+
+
+def reference_subscriptions(query, user):
+    request = drf_request(
+        f'http://testserver/api/users/subscriptions/?{query}', user
+    )
+    fields = fieldsets.requested_fields(
+        request.query_params, fieldsets.SUBSCRIPTION
+    )
+    paginator = CustomPageNumberPagination()
+    page = paginator.paginate_queryset(
+        User.objects.filter(following__user=user).order_by('id'), request
+    )
+    data = SubscriptionSerializer(
+        page, many=True, context={'request': request, 'fields': fields}
+    ).data
+    return JSONRenderer().render(paginator.get_paginated_response(data).data)
+
+
+@pytest.fixture
+def reader(api_client, users, recipes):
+    """Пользователь с избранным, корзиной и подписками."""
+    client = api_client(users[2])
+    client.post(f"/api/recipes/{recipes[1]['id']}/favorite/")
+    client.post(f"/api/recipes/{recipes[0]['id']}/shopping_cart/")
+    client.post(f'/api/users/{users[0].id}/subscribe/')
+    client.post(f'/api/users/{users[1].id}/subscribe/')
+    # Символы, которые JSONRenderer экранирует.
+    Recipe.objects.filter(id=recipes[2]['id']).update(
+        text='строка абзац "кавычки"'
+    )
+    return users[2]
+
+
+RECIPE_QUERIES = (
+    '',
+    'fields=id,name,image',
+    'omit=text,ingredients',
+    'fields=author,is_favorited,is_in_shopping_cart',
+    'fields=tags,cooking_time&omit=cooking_time',
+)
+
+
+@pytest.mark.parametrize('authenticated', (True, False))
+@pytest.mark.parametrize('query', RECIPE_QUERIES)
+def test_recipe_list_matches_serializer(
+    api_client, reader, authenticated, query
+):
+    user = reader if authenticated else None
+    response = api_client(user).get(f'/api/recipes/?page_size=10&{query}')
+    assert response.status_code == 200
+    assert response.content == reference_recipe_list(
+        f'page_size=10&{query}', user
+    )
+
+
+@pytest.mark.parametrize('authenticated', (True, False))
+@pytest.mark.parametrize('query', RECIPE_QUERIES)
+def test_recipe_detail_matches_serializer(
+    api_client, reader, recipes, authenticated, query
+):
+    user = reader if authenticated else None
+    for recipe in recipes:
+        response = api_client(user).get(
+            f"/api/recipes/{recipe['id']}/?{query}"
+        )
+        assert response.status_code == 200
+        assert response.content == reference_recipe(recipe['id'], query, user)
+
+
+@pytest.mark.parametrize(
+    'query',
+    (
+        '',
+        'recipes_limit=1',
+        'page_size=1&page=2',
+        'fields=id,recipes_count',
+        'omit=recipes,email',
+        'fields=recipes&recipes_limit=1',
+    ),
+)
+def test_subscriptions_match_serializer(api_client, reader, query):
+    response = api_client(reader).get(f'/api/users/subscriptions/?{query}')
+    assert response.status_code == 200
+    assert response.content == reference_subscriptions(query, reader)
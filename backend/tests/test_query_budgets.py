@@ -0,0 +1,76 @@
+"""Бюджеты запросов (query_budgets) и отсутствие N+1 на наборе данных,
+где повторы запросов по объектам были бы заметны. Нарушение завершает
+запрос исключением QueryInspectionError (QUERY_INSPECTOR['RAISE'])."""
+import pytest
+
+from api.views import RecipeViewSet
+from profiling.detector import QueryInspectionError
+
+
+@pytest.fixture(autouse=True)
+def raise_on_problems(settings):
+    settings.QUERY_INSPECTOR = {**settings.QUERY_INSPECTOR, 'RAISE': True}
+
+
+@pytest.fixture
+def feed(api_client, users, create_recipe):
+    """По четыре рецепта у трех авторов, читатель подписан на двух
+    и добавил часть рецептов в избранное и корзину."""
+    recipes = [
+        create_recipe(users[number % 3], f'Рецепт {number}', [0, 1], [0, 1])
+        for number in range(12)
+    ]
+    reader = api_client(users[2])
+    for author in users[:2]:
+        reader.post(f'/api/users/{author.id}/subscribe/')
+    for recipe in recipes[::2]:
+        reader.post(f"/api/recipes/{recipe['id']}/favorite/")
+    for recipe in recipes[::3]:
+        reader.post(f"/api/recipes/{recipe['id']}/shopping_cart/")
+    return recipes
+
+
+@pytest.mark.parametrize('authenticated', (True, False))
+@pytest.mark.parametrize(
+    'query',
+    (
+        'page_size=12',
+        'page_size=12&user_state=0',
+        'page_size=12&is_favorited=1',
+        'page_size=12&tags=tag0&tags=tag1',
+        'page_size=12&fields=id,author,is_in_shopping_cart',
+    ),
+)
+def test_recipe_list_budget(api_client, users, feed, authenticated, query):
+    client = api_client(users[2] if authenticated else None)
+    assert client.get(f'/api/recipes/?{query}').status_code == 200
+
+
+@pytest.mark.parametrize('authenticated', (True, False))
+def test_recipe_detail_budget(api_client, users, feed, authenticated):
+    client = api_client(users[2] if authenticated else None)
+    for recipe in feed[:3]:
+        response = client.get(f"/api/recipes/{recipe['id']}/")
+        assert response.status_code == 200
+
+
+def test_recipe_state_budget(api_client, users, feed):
+    ids = ','.join(str(recipe['id']) for recipe in feed)
+    response = api_client(users[2]).get(f'/api/recipes/state/?ids={ids}')
+    assert response.status_code == 200
+    assert len(response.json()) == len(feed)
+
+
+@pytest.mark.parametrize('query', ('', 'recipes_limit=2', 'omit=recipes'))
+def test_subscriptions_budget(api_client, users, feed, query):
+    response = api_client(users[2]).get(
+        f'/api/users/subscriptions/?{query}'
+    )
+    assert response.status_code == 200
+    assert response.json()['count'] == 2
+
+
+def test_budget_violation_raises(api_client, users, feed, monkeypatch):
+    monkeypatch.setitem(RecipeViewSet.query_budgets, 'list', 1)
+    with pytest.raises(QueryInspectionError):
+        api_client(users[2]).get('/api/recipes/')
@@ -0,0 +1,39 @@
+"""Общий кеш ответов ленты не отдает одному пользователю список,
+отфильтрованный по избранному или корзине другого."""
+import pytest
+
+
+def names(response):
+    assert response.status_code == 200
+    return [recipe['name'] for recipe in response.json()['results']]
+
+
+@pytest.mark.parametrize(
+    'endpoint, filter_name',
+    (
+        ('favorite', 'is_favorited'),
+        ('shopping_cart', 'is_in_shopping_cart'),
+    ),
+)
+def test_user_filter_is_not_shared(
+    api_client, users, recipes, endpoint, filter_name
+):
+    first, second = api_client(users[0]), api_client(users[1])
+    first.post(f"/api/recipes/{recipes[0]['id']}/{endpoint}/")
+    second.post(f"/api/recipes/{recipes[1]['id']}/{endpoint}/")
+    url = f'/api/recipes/?{filter_name}=1&user_state=0'
+
+    assert names(first.get(url)) == ['Первый']
+    assert names(second.get(url)) == ['Второй']
+    assert names(api_client().get(url)) == ['Третий', 'Второй', 'Первый']
+
+    first.delete(f"/api/recipes/{recipes[0]['id']}/{endpoint}/")
+    first.post(f"/api/recipes/{recipes[2]['id']}/{endpoint}/")
+    assert names(first.get(url)) == ['Третий']
+
+
+def test_unfiltered_list_without_flags_is_shared(api_client, users, recipes):
+    url = '/api/recipes/?user_state=0'
+    etag = api_client(users[0]).get(url)['ETag']
+    response = api_client(users[1]).get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
@@ -1,10 +1,14 @@
 from django.contrib.admin import ModelAdmin, register
 
+from api.paginators import EstimatedCountPaginator
+from recipes import deletion
+from recipes.admin import BackgroundDeleteMixin
+from recipes.models import Favorite, Recipe, ShoppingCart
 from users.models import Subscription, User
 
 
 @register(User)
-class UserAdmin(ModelAdmin):
+class UserAdmin(BackgroundDeleteMixin, ModelAdmin):
     """Управление пользователями в админке."""
 
     fields = ('username', 'email', 'first_name', 'last_name', 'password')
@@ -13,11 +17,12 @@ class UserAdmin(ModelAdmin):
         'username',
         'email',
     )
-    list_filter = (
-        'username',
-        'email',
-    )
+    list_filter = ('is_staff', 'is_active')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    cascade_models = (Recipe, Favorite, ShoppingCart, Subscription)
+    schedule_deletion = staticmethod(deletion.schedule_user_deletion)
 
 
 @register(Subscription)
@@ -25,5 +30,9 @@ class SubscriptionAdmin(ModelAdmin):
     """Управление подписками в админке."""
 
     list_display = ('id', 'user', 'author')
-    search_fields = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,8 @@
+from jobs.queue import task
+from recipes import deletion
+
+
+@task('users.delete_user')
+def delete_user(user_id):
+    """Удаляем деактивированного пользователя и все его данные порциями."""
+    return {'deleted': deletion.delete_user(user_id)}
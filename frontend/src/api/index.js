@@ -385,10 +385,10 @@ class Api {
     ).then(this.checkResponse)
   }
 
-  downloadFile () {
+  downloadFile (attempt = 0) {
     const token = localStorage.getItem('token')
     return fetch(
-      `/api/recipes/download_shopping_cart/`,
+      `/api/recipes/download_shopping_cart/?async=1`,
       {
         method: 'GET',
         headers: {
@@ -396,7 +396,17 @@ class Api {
           'authorization': `Token ${token}`
         }
       }
-    ).then(this.checkFileDownloadResponse)
+    ).then(res => {
+      // 202: большой список готовится на сервере, повторяем запрос
+      if (res.status === 202 && attempt < 30) {
+        return new Promise(resolve => setTimeout(resolve, 2000))
+          .then(() => this.downloadFile(attempt + 1))
+      }
+      if (res.status === 202) {
+        return Promise.reject()
+      }
+      return this.checkFileDownloadResponse(res)
+    })
   }
 }
 